@@ -43,13 +43,12 @@ ATLASSIAN_EXCEPTIONS = {
 
 """
 
-import os
-import imp
-import time
 import pytest
-import requests
 
-CONFIG = imp.load_source('config', os.environ['WATCHDOG_CONFIG_LOCATION'])
+from watchdogs import inventory, pagination
+from watchdogs.config import load_config
+
+CONFIG = load_config()
 
 def _all_active_atlassian_users():
     """
@@ -57,22 +56,24 @@ def _all_active_atlassian_users():
     ATLASSIAN_EXCEPTIONS (and that the current date is before allowed_until)
     """
 
-    url = "https://%(hostname)s/admin/rest/um/1/user/search?max-results=1000" % {'hostname': CONFIG.ATLASSIAN_HOSTNAME}
-    response = requests.get(url, auth=(CONFIG.ATLASSIAN_USERNAME, CONFIG.ATLASSIAN_PASSWORD))
-    all_users = response.json()
-    return [user['email'].lower() for user in all_users if user['active']]
+    url = "https://%(hostname)s/admin/rest/um/1/user/search" % {'hostname': CONFIG.ATLASSIAN_HOSTNAME}
+    all_users = pagination.offset(url, limit=1000, offset_param='start-index', limit_param='max-results',
+                                  auth=(CONFIG.ATLASSIAN_USERNAME, CONFIG.ATLASSIAN_PASSWORD))
+    active_emails = [user['email'].lower() for user in all_users if user['active']]
+    CONFIG.exception_policy('ATLASSIAN_EXCEPTIONS', literal=True).evaluate(active_emails)
+    return active_emails
 
-@pytest.mark.parametrize("email", _all_active_atlassian_users())
+@pytest.mark.parametrize("email", inventory.register(_all_active_atlassian_users))
 def test_user(email):
     """
     Asserts that every user with a licence is either in ATLASSIAN_VALID_EMAILS or
     ATLASSIAN_EXCEPTIONS (and that the current date is before allowed_until)
     """
-    if email in CONFIG.ATLASSIAN_EXCEPTIONS:
-        valid_until = time.strptime(CONFIG.ATLASSIAN_EXCEPTIONS[email]['allowed_until'], "%d/%m/%Y")
-        assert time.gmtime() <= valid_until
+    exception = CONFIG.exception_policy('ATLASSIAN_EXCEPTIONS', literal=True).match(email)
+    if exception is not None:
+        assert not exception.expired()
     else:
-        assert email in CONFIG.ATLASSIAN_VALID_EMAILS
+        assert email in CONFIG.allowlist('ATLASSIAN_VALID_EMAILS')
 
 
 
@@ -64,80 +64,196 @@ AWS_IAM_VAULT_USER_AUTH_MECHANISM           Only required if AWS_IAM_VALID_VAULT
 AWS_IAM_VAULT_USER_LEASE_TIME               Only required if AWS_IAM_VALID_VAULT_USERS is set. The number of
                                             seconds that you've configured vault to issue AWS token leases for.
 
+AWS_IAM_SNAPSHOT_MODE       bool            OPTIONAL. Set to True to evaluate access keys,
+                                            passwords and MFA for every user from the
+                                            credential report instead of making several
+                                            IAM API calls per user. Users missing from the
+                                            report (e.g. created after it was generated)
+                                            fall back to the per user API calls.
+                                            Note that AWS regenerates the credential
+                                            report at most every 4 hours. Defaults to False
+
+AWS_IAM_CREDENTIAL_REPORT_MAX_AGE_HOURS     OPTIONAL. If the existing credential report was
+                                            generated within this many hours download it
+                                            directly instead of requesting a new one.
+                                            Defaults to 0 (Always request a new report)
+
+AWS_IAM_USE_AUTHORIZATION_DETAILS           OPTIONAL. Set to True to list users with
+                                            GetAccountAuthorizationDetails instead of
+                                            ListUsers, which also returns the groups and
+                                            policies of each user in the same pages
+                                            (Requires iam:GetAccountAuthorizationDetails,
+                                            which iam:Get* includes). Defaults to False
+
+AWS_ACCOUNT_ROLE_ARNS       List[String]    OPTIONAL. The ARNs of roles to assume (with STS)
+                                            in each AWS account to audit. The accounts are
+                                            audited concurrently, and each user is reported
+                                            with the ID of its account. By default only the
+                                            account of the credentials boto is configured
+                                            with is audited
+
 """
+import csv
 import time
 import base64
 import pytest
-from datetime import datetime
+from collections import namedtuple
+from datetime import datetime, timedelta
 from dateutil.parser import parse
 from boto.exception import BotoServerError
-from boto.iam.connection import IAMConnection
 
-CFN = IAMConnection()
+from watchdogs import aws, inventory
+from watchdogs.config import load_config
+from watchdogs.concurrency import parallel_map
+
+CONFIG = load_config()
+
+ACCOUNTS = aws.accounts(getattr(CONFIG, 'AWS_ACCOUNT_ROLE_ARNS', None))
 
-import os
-import imp
-CONFIG = imp.load_source('config', os.environ['WATCHDOG_CONFIG_LOCATION'])
 
+# How long to keep polling for a newly requested credential report to complete
+CREDENTIAL_REPORT_TIMEOUT = 120
 
-def get_credential_report_dict():
+CredentialReportEntry = namedtuple('CredentialReportEntry', ['password_enabled', 'password_last_used',
+                                                             'mfa_active', 'access_keys_last_used'])
+
+def iam(account):
     """
-    Returns the IAM credential report as a python dictionary using the IAM
-    username as a key.
+    Returns the IAM connection for an account
+    :param account: str The ID of the account (A key of ACCOUNTS)
     """
-    CFN.generate_credential_report()
-    time.sleep(5)
-    report = CFN.get_credential_report()
-    report = report['get_credential_report_response']['get_credential_report_result']['content']
-    report = base64.b64decode(report)
-    report = report.split('\n')
+    return aws.iam_connection(ACCOUNTS[account])
 
-    credential_report = {}
+def get_recent_credential_report(account, max_age_hours):
+    """
+    Returns the contents of the existing credential report if it was generated
+    within the last max_age_hours hours
+    :param account: str The ID of the account
+    :param max_age_hours: int The maximum age of a report that can be reused
+    :returns: str   The base64 encoded report, or None if there is no report
+                    recent enough to reuse
+    """
+    try:
+        report = iam(account).get_credential_report()['get_credential_report_response']['get_credential_report_result']
+    except BotoServerError:
+        # ReportNotPresent, ReportExpired or ReportInProgress
+        return None
 
-    field_names = report[0].split(',')
+    generated_time = parse(report['generated_time']).replace(tzinfo=None)
+    if datetime.utcnow() - generated_time > timedelta(hours=max_age_hours):
+        return None
+    return report['content']
 
-    for entry in report[1:]:
-        fields = entry.split(',')
-        credential_report[fields[0]] = dict(zip(field_names, fields))
+def generate_credential_report(account, timeout=CREDENTIAL_REPORT_TIMEOUT):
+    """
+    Requests a new credential report, polling with an exponential backoff until
+    AWS reports that it's complete
+    :param account: str The ID of the account
+    :param timeout: int The number of seconds to wait for the report to complete
+    :returns: str   The base64 encoded report
+    """
+    deadline = time.time() + timeout
+    delay = 0.5
+    while True:
+        response = iam(account).generate_credential_report()
+        state = response['generate_credential_report_response']['generate_credential_report_result']['state']
+        if state == 'COMPLETE' or time.time() + delay > deadline:
+            break
+        time.sleep(delay)
+        delay = min(delay * 2, 10)
+
+    report = iam(account).get_credential_report()
+    return report['get_credential_report_response']['get_credential_report_result']['content']
+
+def parse_credential_report(content):
+    """
+    Parses a base64 encoded credential report in to a dictionary using the IAM
+    username as a key
+    :param content: str The base64 encoded CSV report returned by AWS
+    :returns: dict  A dictionary mapping usernames to CredentialReportEntry
+                    tuples, where access_keys_last_used holds the last used date
+                    of every active access key
+    """
+    rows = csv.DictReader(base64.b64decode(content).decode('utf-8').splitlines())
+    return dict((row['user'], CredentialReportEntry(
+        password_enabled=row['password_enabled'] == 'true',
+        password_last_used=row['password_last_used'],
+        mfa_active=row['mfa_active'] == 'true',
+        access_keys_last_used=tuple(row['access_key_{0}_last_used_date'.format(key)]
+                                    for key in (1, 2) if row['access_key_{0}_active'.format(key)] == 'true')
+    )) for row in rows)
+
+def get_credential_report_dict(account):
+    """
+    Returns the IAM credential report of an account as a python dictionary using
+    the IAM username as a key, reusing an existing report if it's younger than
+    AWS_IAM_CREDENTIAL_REPORT_MAX_AGE_HOURS.
+    :param account: str The ID of the account
+    """
+    max_age_hours = getattr(CONFIG, 'AWS_IAM_CREDENTIAL_REPORT_MAX_AGE_HOURS', 0)
+    content = get_recent_credential_report(account, max_age_hours) if max_age_hours else None
+    if content is None:
+        content = generate_credential_report(account)
+    return parse_credential_report(content)
 
-    return credential_report
+def get_all_credential_reports():
+    """
+    Returns a dictionary mapping each account to its credential report
+    dictionary, generating the reports of every account concurrently
+    """
+    accounts = list(ACCOUNTS)
+    return dict(zip(accounts, parallel_map(get_credential_report_dict, accounts, len(accounts))))
 
-CREDENTIAL_REPORT = get_credential_report_dict()
+CREDENTIAL_REPORT = inventory.register(get_all_credential_reports)
 
-def get_days_since_key_last_login(username):
+def get_days_since(date_string):
     """
-    Returns the number of days since the username provided logged in
-    :param username: string The name of the user you want to check
-    :returns: int   The number of days since the user provided logged in
+    Returns the number of days since the date provided
+    :param date_string: str  A date as returned by the IAM API or credential report
+    :returns: int   The number of days since the date provided, or None if
+                    it isn't a date (e.g. 'N/A' or 'no_information')
     """
     try:
-        last_used_date = CREDENTIAL_REPORT[username]['password_last_used']
-        datetime_now = datetime.now()
-        datetime_last_used = parse(last_used_date)
-        datetime_last_used = datetime_last_used.replace(tzinfo=None)
-        diff = datetime_now - datetime_last_used
-        return diff.days
+        datetime_last_used = parse(date_string)
     except ValueError:
         return None
+    datetime_last_used = datetime_last_used.replace(tzinfo=None)
+    diff = datetime.now() - datetime_last_used
+    return diff.days
 
-def get_days_since_key_last_use(aws_access_key):
+def get_days_since_key_last_login(account, username):
+    """
+    Returns the number of days since the username provided logged in, from the
+    credential report, or from GetUser for users that aren't in the report
+    (e.g. created since a reused report was generated)
+    :param account: str The ID of the account
+    :param username: string The name of the user you want to check
+    :returns: int   The number of days since the user provided logged in, or
+                    None if they've never logged in
+    """
+    entry = CREDENTIAL_REPORT.result()[account].get(username)
+    if entry is not None:
+        return get_days_since(entry.password_last_used)
+
+    user = iam(account).get_user(username)['get_user_response']['get_user_result']['user']
+    password_last_used = user.get('password_last_used')
+    return get_days_since(password_last_used) if password_last_used else None
+
+def get_days_since_key_last_use(account, aws_access_key):
     """
     Returns the number of days since the AWS Access Key provided was last used
+    :param account: str The ID of the account
     :param aws_access_key: string The access key that you want to check
     :returns: int   The number of days since the uaccess key provided was used,
                     or None if it was never used
     """
-    response = CFN.get_response(action='GetAccessKeyLastUsed', params={'AccessKeyId':aws_access_key})
+    response = iam(account).get_response(action='GetAccessKeyLastUsed', params={'AccessKeyId':aws_access_key})
 
     try:
         last_used_date = response['get_access_key_last_used_response']['get_access_key_last_used_result']['access_key_last_used']['last_used_date']
-        datetime_now = datetime.now()
-        datetime_last_used = parse(last_used_date)
-        datetime_last_used = datetime_last_used.replace(tzinfo=None)
-        diff = datetime_now - datetime_last_used
-        return diff.days
     except KeyError:
         return None
+    return get_days_since(last_used_date)
 
 def is_vault_enabled():
     try:
@@ -148,6 +264,21 @@ def is_vault_enabled():
     except AttributeError:
         return False
 
+def is_snapshot_enabled():
+    """
+    Returns True if users should be evaluated from the credential report
+    rather than with per user API calls (See AWS_IAM_SNAPSHOT_MODE)
+    """
+    return getattr(CONFIG, 'AWS_IAM_SNAPSHOT_MODE', False)
+
+def _iam_users(account):
+    """
+    Returns (account, username) for every IAM user in an account
+    :param account: str The ID of the account
+    """
+    details = getattr(CONFIG, 'AWS_IAM_USE_AUTHORIZATION_DETAILS', False)
+    return [(account, user['user_name']) for user in aws.iam_users(ACCOUNTS[account], details=details)]
+
 def _all_iam_users():
     """
     Ensure that all IAM users:
@@ -159,42 +290,79 @@ def _all_iam_users():
     - Every account has only a single AWS access key
     - That all access keys have been used within the last AWS_IAM_KEY_LAST_USED_DAYS
     """
-    iam_users = CFN.get_all_users()
-    return [user['user_name'] for user in iam_users['list_users_response']['list_users_result']['users']]
+    accounts = list(ACCOUNTS)
+    all_iam_users = []
+    for account_users in parallel_map(_iam_users, accounts, len(accounts)):
+        all_iam_users += account_users
+    return all_iam_users
 
 
-def user_has_password(username):
+def user_has_password(account, username):
     """
     Returns true if the user has a password set
+    :param account: str The ID of the account
     :param username: str The username you which to check the existance of a password for
     :return: bool True is the user specified has a password, False if not
     """
     try:
-        CFN.get_login_profiles(username)
+        iam(account).get_login_profiles(username)
         return True
     except BotoServerError:
         return False
 
-def user_has_mfa_enabled(username):
+def user_has_mfa_enabled(account, username):
     """
     Tests whether a given user has two factor authentication enabled
+    :param account: str The ID of the account
     :param username: str The user that you want to test if 2FA is enabled for
     :returns: bool True if 2FA is enabled for this user, False if not
     """
-    mfa_devices = CFN.get_all_mfa_devices(username)
+    mfa_devices = iam(account).get_all_mfa_devices(username)
     return len(mfa_devices['list_mfa_devices_response']['list_mfa_devices_result']['mfa_devices']) > 0
 
-def get_access_keys_for_user(username, active_only=True):
+def get_access_keys_for_user(account, username, active_only=True):
     """
     Returns a list of AWS Access Keys for the given user
+    :param account: str The ID of the account
     :param username: str The username for which you would like to return access keys for
     :returns: list A list of AWS Access Keys associated with this user
     """
-    response = CFN.get_all_access_keys(user_name=username)['list_access_keys_response']['list_access_keys_result']['access_key_metadata']
+    response = iam(account).get_all_access_keys(user_name=username)['list_access_keys_response']['list_access_keys_result']['access_key_metadata']
     return [key['access_key_id'] for key in response if (active_only and key['status'] == 'Active') or not active_only]
 
-@pytest.mark.parametrize("username", _all_iam_users())
-def test_iam_user_is_valid(username):
+def get_snapshot_for_user(account, username):
+    """
+    Returns the access key, password and MFA state of a user as recorded in
+    the credential report, without making any further API calls
+    :param account: str The ID of the account
+    :param username: str The username to look up in the credential report
+    :returns: tuple A tuple of (days_since_keys_last_used, has_password, has_mfa)
+                    where days_since_keys_last_used has one entry per active
+                    access key, or None if the user isn't in the report
+    """
+    entry = CREDENTIAL_REPORT.result()[account].get(username)
+    if entry is None:
+        return None
+
+    days_since_keys_last_used = [get_days_since(last_used) for last_used in entry.access_keys_last_used]
+    return days_since_keys_last_used, entry.password_enabled, entry.mfa_active
+
+def get_live_state_for_user(account, username):
+    """
+    Returns the access key, password and MFA state of a user using per user
+    IAM API calls
+    :param account: str The ID of the account
+    :param username: str The username you want to retrieve the state for
+    :returns: tuple A tuple of (days_since_keys_last_used, has_password, has_mfa)
+                    where days_since_keys_last_used has one entry per active
+                    access key
+    """
+    days_since_keys_last_used = [get_days_since_key_last_use(account, key) for key in get_access_keys_for_user(account, username)]
+    has_password = user_has_password(account, username)
+    return days_since_keys_last_used, has_password, has_password and user_has_mfa_enabled(account, username)
+
+@pytest.mark.parametrize("account,username", inventory.register(_all_iam_users))
+def test_iam_user_is_valid(account, username):
     """
     Ensure that the username of the provided user:
 
@@ -204,6 +372,7 @@ def test_iam_user_is_valid(username):
         - Have logged in to the console in the last AWS_IAM_USER_LAST_LOGGED_IN_DAYS days
     - Has only a single AWS access key
     - That all access keys have been used within the last AWS_IAM_KEY_LAST_USED_DAYS
+    :param account: str     The ID of the account the user is in
     :param user:    str     The AWS IAM user that you would like to validate
     """
     # Assert that the user is known
@@ -215,24 +384,27 @@ def test_iam_user_is_valid(username):
         earliest_create_time = time.time() - CONFIG.AWS_IAM_VAULT_USER_LEASE_TIME - grace_period
         assert tokens[0] == 'vault'
         assert tokens[1] == CONFIG.AWS_IAM_VAULT_USER_AUTH_MECHANISM
-        assert tokens[2] in CONFIG.AWS_IAM_VALID_VAULT_USERS
+        assert tokens[2] in CONFIG.allowlist('AWS_IAM_VALID_VAULT_USERS')
         assert int(tokens[4]) > earliest_create_time
     else:
-        assert username.lower() in CONFIG.AWS_IAM_VALID_USERNAMES
+        assert username in CONFIG.allowlist('AWS_IAM_VALID_USERNAMES')
+
+    state = get_snapshot_for_user(account, username) if is_snapshot_enabled() else None
+    if state is None:
+        state = get_live_state_for_user(account, username)
+    days_since_keys_last_used, has_password, has_mfa = state
 
     # Assert the user has a maximum of one active key
-    access_keys = get_access_keys_for_user(username)
-    assert len(access_keys) <= 1
+    assert len(days_since_keys_last_used) <= 1
 
     # Assert that the key has been used recently
-    for key in access_keys:
-        days_since_last_used = get_days_since_key_last_use(key)
+    for days_since_last_used in days_since_keys_last_used:
         if days_since_last_used is not None:
             assert days_since_last_used < CONFIG.AWS_IAM_KEY_LAST_USED_DAYS
 
     # Is the user has a password check that they've got 2FA enabled and that they've logged in recently
-    if user_has_password(username):
-        assert user_has_mfa_enabled(username)
-        last_login_days = get_days_since_key_last_login(username)
+    if has_password:
+        assert has_mfa
+        last_login_days = get_days_since_key_last_login(account, username)
         assert (last_login_days is not None) and (last_login_days <= CONFIG.AWS_IAM_USER_LAST_LOGGED_IN_DAYS)
 
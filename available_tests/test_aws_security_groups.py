@@ -9,7 +9,8 @@ verifies that:
 Required config.py variables:
 
 AWS_SECURITY_GROUP_REGIONS            List[String]     A list of the AWS regions that
-                                                       you want to audit
+                                                       you want to audit (Not needed if
+                                                       AWS_SECURITY_GROUP_DISCOVER_REGIONS is True)
 
 AWS_SECURITY_GROUP_IGNORE_SGS         List[String]     A list of security group names
                                                        that you want to ignore.
@@ -17,8 +18,9 @@ AWS_SECURITY_GROUP_IGNORE_SGS         List[String]     A list of security group
                                                        that frequently change.
 
 AWS_SECURITY_GROUP_IP_EXCEPTIONS           Dict        A dictionary with IP addresses/ranges
-                                                       (X.X.X.X/NETMASK) as keys and descriptions
-                                                       as values
+                                                       (X.X.X.X/NETMASK, IPv4 or IPv6) as keys and
+                                                       descriptions as values. A grant is known if
+                                                       every address in it is in these ranges
 
 AWS_SECURITY_GROUP_GLOBAL_EXCEPTIONS       Dict        A dictionary using the name of a security
                                                        group as the key mapping to a list of
@@ -29,46 +31,109 @@ AWS_SECURITY_GROUP_IGNORE_IP_STARTING_WITH    String   If an IP address in an ex
                                                        ignore it. Useful for excluding private VPC addresses
                                                        internal to your network
                                                        (This script is designed to audit external access)
+
+Optional config.py variables:
+
+AWS_SECURITY_GROUP_IGNORE_NETWORKS      List[String]   A list of IP ranges (X.X.X.X/NETMASK, IPv4 or
+                                                       IPv6) to ignore grants within, e.g. private
+                                                       address space
+
+AWS_SECURITY_GROUP_DISCOVER_REGIONS     Boolean        If True audit every region enabled for the
+                                                       account instead of AWS_SECURITY_GROUP_REGIONS
+                                                       (Default False)
+
+AWS_SECURITY_GROUP_FILTERS              Dict           EC2 filters applied by AWS when listing security
+                                                       groups, so that only the groups worth auditing
+                                                       are downloaded. Groups that don't match aren't
+                                                       audited. e.g. {'ip-permission.cidr': ['0.0.0.0/0']}
+                                                       (See the DescribeSecurityGroups API for filters)
+
+AWS_SECURITY_GROUP_MAX_WORKERS          int            The maximum number of regions to fetch security
+                                                       groups from at once (Default 8)
+
+AWS_ACCOUNT_ROLE_ARNS                   List[String]   The ARNs of roles to assume (with STS) in each AWS
+                                                       account to audit. By default only the account of
+                                                       the credentials boto is configured with is audited
 """
-import re
-import os
-import imp
 import pytest
-import boto.ec2
 
-CONFIG = imp.load_source('config', os.environ['WATCHDOG_CONFIG_LOCATION'])
+from watchdogs import aws, inventory
+from watchdogs.config import load_config
+from watchdogs.concurrency import parallel_map, DEFAULT_MAX_WORKERS
+from watchdogs.netindex import NetworkIndex, parse_network
 
+CONFIG = load_config()
 
+GLOBAL_NETWORKS = ('0.0.0.0/0', '::/0')
+MAX_WORKERS = getattr(CONFIG, 'AWS_SECURITY_GROUP_MAX_WORKERS', DEFAULT_MAX_WORKERS)
+ACCOUNTS = aws.accounts(getattr(CONFIG, 'AWS_ACCOUNT_ROLE_ARNS', None))
 
-def _all_security_groups_all_regions():
 
-    all_security_groups = []
-
-    for region in CONFIG.AWS_SECURITY_GROUP_REGIONS:
-        conn = boto.ec2.connect_to_region(region)
-        all_security_groups += ([(sg.name, region, sg) for sg in conn.get_all_security_groups()])
+def _security_group_regions(account):
+    """
+    Returns (account, region) for each region to audit in an account
+    """
+    if getattr(CONFIG, 'AWS_SECURITY_GROUP_DISCOVER_REGIONS', False):
+        regions = aws.enabled_regions(ACCOUNTS[account])
+    else:
+        regions = CONFIG.AWS_SECURITY_GROUP_REGIONS
+    return [(account, region) for region in regions]
 
-    return all_security_groups
+def _is_ignored_network(cidr):
+    """
+    Returns True if a grant is for an IP range that isn't audited
+    :param cidr:    str     The IP range of the grant (X.X.X.X/NETMASK)
+    """
+    ignore_prefix = getattr(CONFIG, 'AWS_SECURITY_GROUP_IGNORE_IP_STARTING_WITH', None)
+    if ignore_prefix is not None and cidr.startswith(ignore_prefix):
+        return True
+    return cidr in CONFIG.view('AWS_SECURITY_GROUP_IGNORE_NETWORKS', NetworkIndex, [])
 
-@pytest.mark.parametrize("security_group_name,region,group", _all_security_groups_all_regions())
-def test_all_security_groups(security_group_name, region, group):
+def _is_audited(grant):
+    """
+    Returns True if a grant is for either everywhere (0.0.0.0/0) or an IP range
+    that isn't ignored. Grants to other security groups aren't audited.
     """
-    Iterate through every security group in a configured set of AWS regions and
-    verifies that:
+    if grant.cidr in GLOBAL_NETWORKS:
+        return True
+    return parse_network(grant.cidr) is not None and not _is_ignored_network(grant.cidr)
 
-    - Every IP address exception (Everything except global exceptions - 0.0.0.0/0) are known
-    - Every global exception (0.0.0.0/0) are known
+def _security_group_grants_in_region(account, region):
     """
+    Returns a SecurityGroupGrant for each audited grant of the security groups
+    in a region of an account, filtered by AWS using AWS_SECURITY_GROUP_FILTERS
+    """
+    filters = getattr(CONFIG, 'AWS_SECURITY_GROUP_FILTERS', None)
+    ignored_groups = CONFIG.allowlist('AWS_SECURITY_GROUP_IGNORE_SGS', case_sensitive=True)
+    grants = []
+    for sg in aws.ec2_connection(region, ACCOUNTS[account]).get_all_security_groups(filters=filters):
+        if sg.name not in ignored_groups:
+            grants += [grant for grant in aws.security_group_grants(account, region, sg) if _is_audited(grant)]
+    return grants
+
+def _all_security_group_grants_all_regions():
+
+    all_regions = []
+    for account_regions in parallel_map(_security_group_regions, list(ACCOUNTS), MAX_WORKERS):
+        all_regions += account_regions
+
+    all_grants = []
+    for region_grants in parallel_map(lambda account_region: _security_group_grants_in_region(*account_region),
+                                      all_regions, MAX_WORKERS):
+        all_grants += region_grants
+
+    return all_grants
+
+@pytest.mark.parametrize("grant", inventory.register(_all_security_group_grants_all_regions),
+                         ids=lambda grant: grant.test_id)
+def test_security_group_grant(grant):
+    """
+    Verifies that a grant of a security group rule is known:
 
-    for rule in group.rules:
-        for grant in rule.grants:
-            if group.name not in CONFIG.AWS_SECURITY_GROUP_IGNORE_SGS:
-                strrule = str(rule.ip_protocol).upper() + "-" + str(rule.from_port)  + "-" +  str(rule.to_port)  + "-" + str(grant)
-                if str(grant) == '0.0.0.0/0':
-                    assert strrule in CONFIG.AWS_SECURITY_GROUP_GLOBAL_EXCEPTIONS[group.name]
-                elif re.match(r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}/\d{1,2}', str(grant)) and \
-                     not str(grant).startswith(CONFIG.AWS_SECURITY_GROUP_IGNORE_IP_STARTING_WITH) and \
-                     not group.name not in CONFIG.AWS_SECURITY_GROUP_IGNORE_SGS:
-                    assert grant in CONFIG.AWS_SECURITY_GROUP_IP_EXCEPTIONS.keys()
-                else:
-                    assert True
+    - A global grant (0.0.0.0/0) must be in the group's AWS_SECURITY_GROUP_GLOBAL_EXCEPTIONS
+    - Any other IP address grant must be in AWS_SECURITY_GROUP_IP_EXCEPTIONS
+    """
+    if grant.cidr in GLOBAL_NETWORKS:
+        assert grant.rule_key in CONFIG.AWS_SECURITY_GROUP_GLOBAL_EXCEPTIONS[grant.group_name]
+    else:
+        assert grant.cidr in CONFIG.view('AWS_SECURITY_GROUP_IP_EXCEPTIONS', NetworkIndex)
@@ -10,23 +10,27 @@ DROPBOX_APP_ACCESS_TOKEN        String      The API key used to access your drop
 DROPBOX_ALLOWED_EMAILS      List[String]    A list of all allowed email addresses for your Dropbox for business account
 
 """
-import os
-import imp
 import json
 import pytest
-import requests
 
-CONFIG = imp.load_source('config', os.environ['WATCHDOG_CONFIG_LOCATION'])
+from watchdogs import client, inventory, pagination
+from watchdogs.config import load_config
+
+CONFIG = load_config()
 
 def _all_dropbox_emails():
     headers = {'Authorization': 'Bearer {0}'.format(CONFIG.DROPBOX_APP_ACCESS_TOKEN), 'Content-Type': 'application/json'}
-    response = requests.post('https://api.dropbox.com/2/team/members/list', headers=headers, data=json.dumps({'limit': 1000}))
-    return [member['profile']['email'] for member in response.json()['members']]
+    members = pagination.cursor(
+        first_page=lambda: client.post('https://api.dropbox.com/2/team/members/list', headers=headers, data=json.dumps({'limit': 1000}), retry=True),
+        next_page=lambda cursor: client.post('https://api.dropbox.com/2/team/members/list/continue', headers=headers, data=json.dumps({'cursor': cursor}), retry=True),
+        items=lambda response: response.json()['members'],
+        next_cursor=lambda response: response.json()['has_more'] and response.json()['cursor'])
+    return [member['profile']['email'] for member in members]
 
-@pytest.mark.parametrize("email", _all_dropbox_emails())
+@pytest.mark.parametrize("email", inventory.register(_all_dropbox_emails))
 def test_dropbox_user(email):
     """
     Asserts that all emaill addresses associated with your Dropbox for business account are in the
     list DROPBOX_ALLOWED_EMAILS (Case insensitive)
     """
-    assert email.lower() in CONFIG.DROPBOX_ALLOWED_EMAILS
+    assert email in CONFIG.allowlist('DROPBOX_ALLOWED_EMAILS')
@@ -1,11 +1,11 @@
 #!/usr/bin/env python
 
-import imp
-import os
 import pytest
-import requests
 
-CONFIG = imp.load_source('config', os.environ['WATCHDOG_CONFIG_LOCATION'])
+from watchdogs import client, inventory, pagination
+from watchdogs.config import load_config
+
+CONFIG = load_config()
 
 
 def _get_all_facebook_business_manager_users():
@@ -47,19 +47,20 @@ def _get_all_facebook_business_manager_users():
           '?access_token={1}' \
           '&limit=1000'.format(
               CONFIG.FACEBOOK_BUSINESS_ID, CONFIG.FACEBOOK_ACCESS_TOKEN)
-    rsp = requests.get(url)
-    rsp.raise_for_status()
-    for json in rsp.json()['data']:
-        print json
+    users = pagination.cursor(first_page=lambda: client.get(url),
+                              next_page=client.get,
+                              items=lambda response: response.json()['data'],
+                              next_cursor=lambda response: response.json().get('paging', {}).get('next'))
+    for json in users:
         if ('is_system_user' not in json) or (not json['is_system_user']):
             all_business_manager_users.append((json['business_persona']['name'],json['email']))
     return all_business_manager_users
 
 
-@pytest.mark.parametrize("facebook_name,facebook_email,", _get_all_facebook_business_manager_users())
+@pytest.mark.parametrize("facebook_name,facebook_email,", inventory.register(_get_all_facebook_business_manager_users))
 def test_facebook_user_is_in_ldap(facebook_name,facebook_email):
 
     #is_known_facebook_id = facebook_user_id in CONFIG.FACEBOOK_IDS
-    is_known_email_address = facebook_email in CONFIG.FACEBOOK_KNOWN_EMAILS
+    is_known_email_address = facebook_email in CONFIG.allowlist('FACEBOOK_KNOWN_EMAILS')
 
-    assert is_known_email_address or facebook_name.upper() in CONFIG.FACEBOOK_NAMES
+    assert is_known_email_address or facebook_name in CONFIG.allowlist('FACEBOOK_NAMES')
@@ -15,6 +15,31 @@ GITHUB_API_TOKEN            String          A github API token that has access
                                             GITHUB_ORGANISATIONS
 
 
+GITHUB_MAX_WORKERS          int             OPTIONAL. The maximum number of repositories
+                                            to request hooks for concurrently. Concurrency
+                                            drops automatically as the API rate limit
+                                            runs low. Defaults to 8
+
+GITHUB_USE_GRAPHQL          bool            OPTIONAL. Set to True to list repositories with
+                                            the GraphQL API. Defaults to False
+
+GITHUB_HOOKS_STATE_FILE     String          OPTIONAL. A JSON file to save the hooks of every
+                                            repository in between runs. When set, the hooks
+                                            of every repository are still requested on every
+                                            run, but with the saved ETag (If-None-Match), so
+                                            unchanged hooks aren't downloaded again and
+                                            github doesn't count the request against the
+                                            rate limit. Repositories that have been pushed to
+                                            or updated since the last run, or whose hooks
+                                            haven't been downloaded for
+                                            GITHUB_HOOKS_FULL_RESCAN_HOURS, are requested
+                                            without the ETag
+
+GITHUB_HOOKS_FULL_RESCAN_HOURS  int         OPTIONAL. The number of hours after which the hooks
+                                            of a repository are downloaded again even if
+                                            github reports that they haven't changed.
+                                            Defaults to 24
+
 GITHUB_ALLOWED_HOOKS   List[String]         A list of dictionary objects that can
                                             either be whole or partial matches to
                                             the json returned by the github list
@@ -23,7 +48,9 @@ GITHUB_ALLOWED_HOOKS   List[String]         A list of dictionary objects that ca
                                             https://developer.github.com/v3/repos/hooks/#list-hooks
 
                                             Allows you to be as explicit as you like
-                                            when matching hooks.
+                                            when matching hooks. String values match
+                                            if they are contained in the hook's value,
+                                            all other values must be equal.
 
 Examples:
 GITHUB_ORGANISATIONS = ['myorg1', 'myorg2']
@@ -41,38 +68,23 @@ GITHUB_ALLOWED_HOOKS = [{'config' : {'domain': 'notify.travis-ci.org', 'user': '
 """
 
 
-import os
-import imp
 import pytest
-import requests
 
-CONFIG = imp.load_source('config', os.environ['WATCHDOG_CONFIG_LOCATION'])
+from watchdogs import client, github, inventory, pagination
+from watchdogs.config import load_config
+from watchdogs.concurrency import DEFAULT_MAX_WORKERS
+from watchdogs.matching import HookAllowlist
 
+CONFIG = load_config()
 
-def get_all_github_repos(organisation):
-    """
-    Given an organisation returns list of dictionaries, one per repo. For detail
-    on response format see:
+MAX_WORKERS = getattr(CONFIG, 'GITHUB_MAX_WORKERS', DEFAULT_MAX_WORKERS)
 
-    https://developer.github.com/v3/repos/#list-your-repositories
+USE_GRAPHQL = getattr(CONFIG, 'GITHUB_USE_GRAPHQL', False)
 
-    :param organisation: (str) The github organisation for which to return a list
-                               of all repositories for
-    :returns:                  A list of dictionaries as defined by
-                               https://developer.github.com/v3/repos/#list-your-repositories
-    """
-    all_github_repos = []
-    uri = 'https://api.github.com/orgs/{0}/repos'.format(organisation)
-    response = requests.get(uri, auth=(CONFIG.GITHUB_API_TOKEN, 'x-oauth-basic'))
-    all_github_repos += (response.json())
+STATE_FILE = getattr(CONFIG, 'GITHUB_HOOKS_STATE_FILE', None)
 
-    page = 2
-    while len(response.json()) > 0:
-        response = requests.get(uri + "?page={0}".format(page), auth=(CONFIG.GITHUB_API_TOKEN, 'x-oauth-basic'))
-        all_github_repos += response.json()
-        page += 1
+FULL_RESCAN_HOURS = getattr(CONFIG, 'GITHUB_HOOKS_FULL_RESCAN_HOURS', 24)
 
-    return all_github_repos
 
 def get_hooks_for_repo(organisation, reponame):
     """
@@ -88,9 +100,44 @@ def get_hooks_for_repo(organisation, reponame):
                                   https://developer.github.com/v3/repos/hooks/#list-hooks
     """
 
+    return _hooks(_get_hooks_response(organisation, reponame))
+
+# The most hooks github returns per page
+HOOKS_PER_PAGE = 100
+
+def _get_hooks_response(organisation, reponame, headers=None):
     uri = 'https://api.github.com/repos/{0}/{1}/hooks'.format(organisation, reponame)
-    response = requests.get(uri, auth=(CONFIG.GITHUB_API_TOKEN, 'x-oauth-basic'))
-    return response.json()
+    return client.get(uri, auth=github.rest_auth(CONFIG.GITHUB_API_TOKEN), headers=headers,
+                      params={'per_page': HOOKS_PER_PAGE})
+
+def _hooks(response):
+    """
+    Returns the hooks in the first page of hooks and every page after it, or
+    the error (a single dictionary) in the first page
+    """
+    hooks = response.json()
+    next_url = response.links.get('next', {}).get('url')
+    if isinstance(hooks, list) and next_url:
+        hooks += list(pagination.link_header(next_url, auth=github.rest_auth(CONFIG.GITHUB_API_TOKEN)))
+    return hooks
+
+def _scan_hooks(repo, previous):
+    """
+    Returns (hooks, etag) for a repository, reusing the hooks from the previous
+    scan if github reports that they haven't changed
+    :param repo:        Repository  The repository
+    :param previous:    dict        The saved result of the last scan, or None
+    """
+    headers = {}
+    if previous is not None and previous.get('etag'):
+        headers['If-None-Match'] = previous['etag']
+    response = _get_hooks_response(repo.organisation, repo.name, headers)
+    if response.status_code == 304:
+        return previous['result'], previous['etag']
+    # The ETag only covers the first page, so hooks spanning several pages are
+    # always requested again
+    etag = response.headers.get('ETag') if 'next' not in response.links else None
+    return _hooks(response), etag
 
 
 def _get_all_github_hooks():
@@ -98,64 +145,28 @@ def _get_all_github_hooks():
     Tests that all repos for all the organisations specified in CONFIG.GITHUB_ORGANISATIONS
     have no unknown web or email hooks
     """
+    all_repos = github.all_repositories(CONFIG.GITHUB_ORGANISATIONS, CONFIG.GITHUB_API_TOKEN, USE_GRAPHQL)
+
+    if STATE_FILE:
+        state = github.RepositoryScanState(STATE_FILE, FULL_RESCAN_HOURS * 60 * 60)
+        # Errors (e.g. missing admin rights) aren't saved, so they're retried next run
+        all_repo_hooks = state.scan(all_repos, _scan_hooks, is_complete=lambda hooks: isinstance(hooks, list),
+                                    max_workers=MAX_WORKERS, revalidate=True)
+    else:
+        all_repo_hooks = github.map_repositories(lambda repo: get_hooks_for_repo(repo.organisation, repo.name),
+                                                 all_repos, MAX_WORKERS)
+
     all_hooks = []
-    for organisation in CONFIG.GITHUB_ORGANISATIONS:
-        for repo in get_all_github_repos(organisation):
-            all_hooks.append((repo['name'], organisation, get_hooks_for_repo(organisation, repo)))
+    for repo, hooks in zip(all_repos, all_repo_hooks):
+        # An error (e.g. missing admin rights) is returned as a single dictionary
+        if not isinstance(hooks, list):
+            hooks = [hooks]
+        for hook in hooks:
+            all_hooks.append((repo.name, repo.organisation, hook))
     return all_hooks
 
 
-def dictionary_match(dict1, dict2):
-    """
-    Recursively tests whether dict1 is a "loose" subset of dict2, where loose means
-    string values in dict1 are "in" the opposite value in dict2, meaning these two dictionaries
-    are considered "matched":
-
-    dict1:
-
-        {'config' : {'url': 'https://tbonetv.jira.com/rest/bitbucket/1.0/repository'}}
-
-    dict2:
-
-    { 'active': True,
-      'config': {
-          'url':
-          'https://tbonetv.jira.com/rest/bitbucket/1.0/repository/1234/sync'
-        },
-      'created_at': u'2015-08-10T15:10:24Z',
-      'events': ['push'],
-      'id': 123456,
-      'last_response': {
-        'code': 200,
-        'message': u'OK',
-        'status':
-        'active'
-      },
-      'name': u'web',
-      'ping_url': 'https://api.github.com/repos/zeebox/MyRepo/hooks/123456/pings',
-      'test_url': 'https://api.github.com/repos/zeebox/MyRepo/hooks/123456/test',
-      'updated_at': '2015-08-10T15:10:24Z',
-      'url': 'https://api.github.com/repos/zeebox/MyRepo/hooks/123456'}
-
-
-    Shamelessly copied from:
-    http://stackoverflow.com/questions/9323749/python-check-if-one-dictionary-is-a-subset-of-another-larger-dictionary
-    """
-    try:
-        for pkey, pvalue in dict1.iteritems():
-            if type(pvalue) is dict:
-                result = dictionary_match(pvalue, dict2[pkey])
-            elif type(pvalue) is str:
-                assert pvalue in dict2[pkey]
-                result = True
-            else:
-                assert dict2[pkey] == pvalue
-                result = True
-    except (AssertionError, KeyError):
-        result = False
-    return result
-
-@pytest.mark.parametrize("repo,organisation,hook", _get_all_github_hooks())
+@pytest.mark.parametrize("repo,organisation,hook", inventory.register(_get_all_github_hooks))
 def test_allowed_hook(repo,organisation,hook):
     """
     Asserts that a given hook matches all of the data in a entry in
@@ -163,9 +174,5 @@ def test_allowed_hook(repo,organisation,hook):
 
     :param hook:    (dict)  A dictionary object as returned by the github webhooks
                             API (https://developer.github.com/v3/repos/hooks/#list-hooks)
-    :returns:       (bool)  True is this is an allowed hook, False if not
     """
-
-    # Check if it's an allowed exception
-    hook_allow_booleans = [dictionary_match(hook_exception, hook) for hook_exception in CONFIG.GITHUB_ALLOWED_HOOKS]
-    return False in hook_allow_booleans
+    assert CONFIG.view('GITHUB_ALLOWED_HOOKS', HookAllowlist).matches(hook)
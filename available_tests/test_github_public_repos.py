@@ -13,39 +13,31 @@ GITHUB_API_TOKEN                String        A github API token that has access
                                               to all the organisations in
                                               GITHUB_PRIVATE_ORGANISATIONS
 
+Optional config.py variables:
+
+GITHUB_USE_GRAPHQL              bool          Set to True to list repositories with the
+                                              GraphQL API. Defaults to False
+
 Examples:
 GITHUB_PRIVATE_ORGANISATIONS = ['myorg1', 'myorg2']
 GITHUB_API_TOKEN = '123456789ABCDEFG'
 
 """
 
-import os
-import imp
 import pytest
-import requests
 
-CONFIG = imp.load_source('config', os.environ['WATCHDOG_CONFIG_LOCATION'])
+from watchdogs import github, inventory
+from watchdogs.config import load_config
+
+CONFIG = load_config()
+
+USE_GRAPHQL = getattr(CONFIG, 'GITHUB_USE_GRAPHQL', False)
 
 def _get_all_github_repos():
 
-    all_github_repos = []
-    for organisation in CONFIG.GITHUB_PRIVATE_ORGANISATIONS:
-      uri = 'https://api.github.com/orgs/{0}/repos'.format(organisation)
-
-      page = 1
-      more_data = True
-      while more_data:
-          response = requests.get(uri + "?page={0}".format(page), auth=(CONFIG.GITHUB_API_TOKEN, 'x-oauth-basic')).json()
-          #print response
-          if len(response) > 0:
-            for repo in response:
-              all_github_repos.append((repo['name'],repo))
-            page += 1
-          else:
-            more_data = False
-
-    return all_github_repos
-
-@pytest.mark.parametrize("repo_name,repo", _get_all_github_repos())
+    all_github_repos = github.all_repositories(CONFIG.GITHUB_PRIVATE_ORGANISATIONS, CONFIG.GITHUB_API_TOKEN, USE_GRAPHQL)
+    return [(repo.name, repo) for repo in all_github_repos]
+
+@pytest.mark.parametrize("repo_name,repo", inventory.register(_get_all_github_repos))
 def test_repo(repo_name, repo):
-      assert repo['private']
+      assert repo.private
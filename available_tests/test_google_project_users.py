@@ -1,19 +1,43 @@
 #!/usr/bin/env python
 
-import imp
 import json
-import os
+import threading
+
+import pytest
 import requests
 
-CONFIG = imp.load_source('config', os.environ['WATCHDOG_CONFIG_LOCATION'])
+from watchdogs import inventory
+from watchdogs.config import load_config
+from watchdogs.concurrency import parallel_map
 
-GOOGLE_PROJECTS = CONFIG.GOOGLE_PROJECTS
-GOOGLE_EMAILS = CONFIG.GOOGLE_EMAILS
+CONFIG = load_config()
 
+# Login cookies by (email, password), so that projects sharing credentials
+# only log in once
+_LOGINS = {}
+_LOGIN_LOCKS = {}
+_LOCK = threading.Lock()
+
+
+def reset():
+    """
+    Forgets the cached logins (Called by watchdogs/daemon.py between runs)
+    """
+    with _LOCK:
+        _LOGINS.clear()
+
+
+def _login(email, password):
+    """
+    Returns the SID, HSID and SSID cookies of a login, logging in the first
+    time the credentials are used
+    """
+    with _LOCK:
+        lock = _LOGIN_LOCKS.setdefault((email, password), threading.Lock())
+    with lock:
+        if (email, password) in _LOGINS:
+            return _LOGINS[(email, password)]
 
-def test_google_project_users():
-    prj_and_users = []
-    for prj in GOOGLE_PROJECTS:
         rsp = requests.get("https://accounts.google.com/ServiceLoginAuth")
         rsp.raise_for_status()
         galx = rsp.cookies["GALX"]
@@ -22,39 +46,69 @@ def test_google_project_users():
             "https://accounts.google.com/ServiceLoginAuth",
             data={
                 "GALX": galx,
-                "Email": prj["email"],
-                "Passwd": prj["password"],
+                "Email": email,
+                "Passwd": password,
             },
             cookies={"GALX": galx},
             allow_redirects=False,
         )
         rsp.raise_for_status()
-        sid = rsp.cookies["SID"]
-        hsid = rsp.cookies["HSID"]
-        ssid = rsp.cookies["SSID"]
+        cookies = {"SID": rsp.cookies["SID"], "HSID": rsp.cookies["HSID"], "SSID": rsp.cookies["SSID"]}
+        _LOGINS[(email, password)] = cookies
+        return cookies
+
+
+def _forget_login(email, password, cookies):
+    """
+    Forgets a cached login that's no longer accepted, unless another thread has
+    already replaced it
+    """
+    with _LOCK:
+        if _LOGINS.get((email, password)) is cookies:
+            del _LOGINS[(email, password)]
 
-        url = "https://console.developers.google.com/m/teamlist?pid=" + \
-              prj["number"]
+
+def _is_logged_out(rsp):
+    """
+    Returns True if a response means the login has expired: an authorisation
+    error or a redirect (to the login page)
+    """
+    return rsp.status_code in (401, 403) or rsp.is_redirect
+
+
+def _project_users(prj):
+    url = "https://console.developers.google.com/m/teamlist?pid=" + \
+          prj["number"]
+    for attempt in range(2):
+        cookies = _login(prj["email"], prj["password"])
         rsp = requests.get(
             url,
-            cookies={"SID": sid, "HSID": hsid, "SSID": ssid},
+            cookies=cookies,
+            allow_redirects=False,
         )
-        rsp.raise_for_status()
-        json1 = json.loads(rsp.text[5:])  # skip ")]}\n"
-        users = json1["teamList"]
-
-        suffix = ".gserviceaccount.com"
+        if not _is_logged_out(rsp) or attempt:
+            break
+        # Log in again once, in case the cached login has expired
+        _forget_login(prj["email"], prj["password"], cookies)
+    rsp.raise_for_status()
+    if rsp.is_redirect:
+        raise requests.HTTPError("Redirected to {0} when logged in as {1}".format(
+            rsp.headers.get("Location"), prj["email"]), response=rsp)
+    json1 = json.loads(rsp.text[5:])  # skip ")]}\n"
+    return [{"prj": prj, "user": user, } for user in json1["teamList"]]
 
-        for user in users:
-            prj_and_users.append({"prj": prj, "user": user, })
 
-    for prj_and_user in prj_and_users:
-        yield google_user_is_in_ldap, prj_and_user
+def _all_google_project_users():
+    prj_and_users = []
+    for users in parallel_map(_project_users, CONFIG.GOOGLE_PROJECTS, len(CONFIG.GOOGLE_PROJECTS)):
+        prj_and_users += users
+    return prj_and_users
 
 
-def google_user_is_in_ldap(prj_and_user):
+@pytest.mark.parametrize("prj_and_user", inventory.register(_all_google_project_users))
+def test_google_user_is_in_ldap(prj_and_user):
     prj = prj_and_user["prj"]
     email = prj_and_user["user"]["email"]
-    assert email.endswith(".gserviceaccount.com") or email in GOOGLE_EMAILS, \
+    assert email.endswith(".gserviceaccount.com") or email in CONFIG.allowlist('GOOGLE_EMAILS'), \
         "Unknown email on [{0}] ({1}): [{2}]".format(
             prj["name"], prj["number"], email)
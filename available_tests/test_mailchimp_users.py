@@ -13,11 +13,12 @@ MAILCHIMP_VALID_EMAILS    List         A list of email addresses for valid Mailc
 
 """
 
-import os
-import imp
 import pytest
-import requests
-CONFIG = imp.load_source('config', os.environ['WATCHDOG_CONFIG_LOCATION'])
+
+from watchdogs import client, inventory
+from watchdogs.config import load_config
+
+CONFIG = load_config()
 
 def _all_mailchimp_team_members():
     """
@@ -25,13 +26,13 @@ def _all_mailchimp_team_members():
     (See https://apidocs.mailchimp.com/api/2.0/users/logins.php for fields)
     """
     uri = "https://{0}.api.mailchimp.com/2.0//users/logins.json?apikey={1}-us4".format(CONFIG.MAILCHIMP_DATACENTER, CONFIG.MAILCHIMP_API_KEYS)
-    response = requests.get(uri)
+    response = client.get(uri)
     all_mailchimp_users = response.json()
     return [user['email'] for user in all_mailchimp_users]
 
-@pytest.mark.parametrize("email", _all_mailchimp_team_members())
+@pytest.mark.parametrize("email", inventory.register(_all_mailchimp_team_members))
 def test_mailchimp_user(email):
     """
     Assert that all email addresses of all users in Mailchimp are known
     """
-    assert email in CONFIG.MAILCHIMP_VALID_EMAILS
\ No newline at end of file
+    assert email in CONFIG.allowlist('MAILCHIMP_VALID_EMAILS')
\ No newline at end of file
@@ -15,72 +15,93 @@ Required config.py variables:
 OFFICE_365_VALID_EMAILS         list        A list of valid/epected email
                                             accounts
 
-OFFICE_365_USERS_CSV_CONTENTS   string      The raw contents of the users.csv
-                                            file generated by the
+OFFICE_365_USERS_CSV_PATH       string      The path of the users.csv file
+                                            generated by the
                                             export-office365-outlook-users.ps1
                                             script
 
-OFFICE_365_ADMIN_TXT_CONTENTS   string      The raw contents of the admins.txt
-                                            file generated by the
+OFFICE_365_ADMIN_TXT_PATH       string      The path of the admins.txt file
+                                            generated by the
                                             export-office365-outlook-users.ps1
                                             script
 
 OFFICE_365_ALLOWED_ADMINS       list        A list of allowed email addresses
                                             for administrator roles
+
+Instead of the paths, OFFICE_365_USERS_CSV_CONTENTS and
+OFFICE_365_ADMIN_TXT_CONTENTS can be set to the raw contents of the files.
 """
 
-import os
-import imp
+import io
+import csv
+import sys
+
 import pytest
-CONFIG = imp.load_source('config', os.environ['WATCHDOG_CONFIG_LOCATION'])
+
+from watchdogs import inventory
+from watchdogs.config import load_config
+
+CONFIG = load_config()
+
+
+def _export_lines(path_setting, contents_setting):
+    """
+    Yields the lines of an export file, streamed from the file at the path in
+    path_setting if it's set, or else split from the contents in
+    contents_setting
+    """
+    path = getattr(CONFIG, path_setting, None)
+    if path is None:
+        for line in getattr(CONFIG, contents_setting).splitlines():
+            yield line
+        return
+
+    if sys.version_info[0] < 3:
+        # The Python 2 csv module only reads byte strings
+        export_file = open(path, 'rb')
+    else:
+        export_file = io.open(path, encoding='utf-8-sig', newline='')
+    with export_file:
+        for line in export_file:
+            yield line
 
 
 def _all_outlook_users():
     """
-    Splits the contents of the users.csv file in to lines and tokenises each
-    entry, verifying that each entry has at least one email address
-    specified in OFFICE_365_VALID_EMAILS variable.
+    Reads each row of users.csv, returning the display name and email
+    addresses of each mailbox
     """
-    users = CONFIG.OFFICE_365_USERS_CSV_CONTENTS.split('\r\n')
     user_list = []
-    for user in users:
-        fields = [field[1:-1] for field in user.split(',')]
-        if len(fields) > 1:
-            display_name = fields[0]
-            if display_name != "DisplayName":
-                object_type = fields[1]
-                if object_type == "UserMailbox":
-                    email_addresses = fields[2]
-                    emails = [mail.lower().split(":")[1].replace('"', '') for mail in email_addresses.split() if '@' in mail]
-                    user_list.append((display_name, emails))
+    for row in csv.reader(_export_lines('OFFICE_365_USERS_CSV_PATH', 'OFFICE_365_USERS_CSV_CONTENTS')):
+        # Skips the "#TYPE" line and the header, as well as other recipient types
+        if len(row) > 2 and row[1] == "UserMailbox":
+            display_name, email_addresses = row[0], row[2]
+            emails = [mail.lower().split(":", 1)[-1] for mail in email_addresses.split() if '@' in mail]
+            user_list.append((display_name, emails))
     return user_list
 
 def _all_outlook_admin_users():
     """
-    Splits the contents of the users.csv file in to lines and tokenises each
-    entry, verifying that each entry has at least one email address
-    specified in OFFICE_365_VALID_EMAILS variable.
+    Returns every email address in admins.txt
     """
     admin_email_list = []
-    admin_output = CONFIG.OFFICE_365_ADMIN_TXT_CONTENTS.split('\r\n')
-    for line in admin_output:
-        tokens = [field.lower() for field in line.split()]
-        for token in tokens:
+    for line in _export_lines('OFFICE_365_ADMIN_TXT_PATH', 'OFFICE_365_ADMIN_TXT_CONTENTS'):
+        for token in line.split():
             if '@' in token:
-                admin_email_list.append(token)
+                admin_email_list.append(token.lower())
     return admin_email_list
 
-@pytest.mark.parametrize("admin_email", _all_outlook_admin_users())
+@pytest.mark.parametrize("admin_email", inventory.register(_all_outlook_admin_users))
 def test_outlook_admin_is_known(admin_email):
     """
     Splits the contents of admin.txt in to lines and ensures that each
     administrator email address is present in the OFFICE_365_ALLOWED_ADMINS
     variable.
     """
-    assert admin_email in CONFIG.OFFICE_365_ALLOWED_ADMINS
+    assert admin_email in CONFIG.allowlist('OFFICE_365_ALLOWED_ADMINS')
 
 
-@pytest.mark.parametrize("display_name,email_addresses", _all_outlook_users())
+@pytest.mark.parametrize("display_name,email_addresses", inventory.register(_all_outlook_users))
 def test_outlook_user_is_valid(display_name, email_addresses):
     """
     Asserts that at least one email address associated with a user is valid
@@ -93,5 +114,4 @@ def test_outlook_user_is_valid(display_name, email_addresses):
     """
     assert display_name is not None
     # Check that at least one of the emails associated with this user is in LDAP
-    matches = [email in CONFIG.OFFICE_365_VALID_EMAILS for email in email_addresses]
-    assert True in matches
+    assert CONFIG.allowlist('OFFICE_365_VALID_EMAILS').matches(email_addresses)
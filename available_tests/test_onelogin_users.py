@@ -11,24 +11,53 @@ ONELOGIN_API_KEY       String       The API key used to conncet to Onelogin
 
 """
 
-import requests
-from bs4 import BeautifulSoup
+try:
+    from xml.etree import cElementTree as ElementTree
+except ImportError:
+    from xml.etree import ElementTree
+
 from requests.auth import HTTPBasicAuth
 
-import os
-import imp
 import pytest
 
-CONFIG = imp.load_source('config', os.environ['WATCHDOG_CONFIG_LOCATION'])
+from watchdogs import inventory, pagination
+from watchdogs.config import load_config
+
+CONFIG = load_config()
+
+def _users(response):
+    """
+    Streams (id, email) for each <user> in a page of users.xml from the
+    response body as it's downloaded, only reading the elements of the users
+    themselves and discarding each user once it's been read. Users without an
+    email address are included (with an email of None), so that paging counts
+    every user in the page.
+    """
+    response.raw.decode_content = True
+    depth = 0
+    try:
+        for event, element in ElementTree.iterparse(response.raw, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 1 and element.tag == 'user':
+                email = element.findtext('email')
+                yield element.findtext('id'), email.strip() if email else None
+                element.clear()
+    finally:
+        response.close()
 
 def _all_onelogin_users():
-    onelogin_xml = requests.get("https://app.onelogin.com/api/v2/users.xml", auth=HTTPBasicAuth(CONFIG.ONELOGIN_API_KEY, ',x'))
-    dom = BeautifulSoup(onelogin_xml.text)
-    return [email.contents[0] for email in dom.findAll('email')]
+    users = pagination.page_number("https://app.onelogin.com/api/v2/users.xml",
+                                   items=_users,
+                                   auth=HTTPBasicAuth(CONFIG.ONELOGIN_API_KEY, ',x'),
+                                   stream=True)
+    return [email for _, email in users if email]
 
-@pytest.mark.parametrize("email_address", _all_onelogin_users())
+@pytest.mark.parametrize("email_address", inventory.register(_all_onelogin_users))
 def test_onelogin_users(email_address):
     """
     Assert that all email addresses of all users in Onelogin are known
     """
-    assert email_address in CONFIG.ONELOGIN_VALID_EMAILS
\ No newline at end of file
+    assert email_address in CONFIG.allowlist('ONELOGIN_VALID_EMAILS')
\ No newline at end of file
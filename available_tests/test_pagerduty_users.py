@@ -12,20 +12,23 @@ PAGERDUTY_ACCOUNT_NAME      String    The pagerduty account name used to call th
 PAGERDUTY_VALID_EMAILS      List      A list of valid email addresses (Case insensitive)
 """
 
-import os
-import imp
 import pytest
-import requests
 
-CONFIG = imp.load_source('config', os.environ['WATCHDOG_CONFIG_LOCATION'])
+from watchdogs import inventory, pagination
+from watchdogs.config import load_config
+
+CONFIG = load_config()
 
 def _all_pagerduty_users():
     headers = {'Authorization': 'Token token={0}'.format(CONFIG.PAGERDUTY_API_KEY)}
-    response = requests.get('https://{0}.pagerduty.com/api/v1/users'.format(CONFIG.PAGERDUTY_ACCOUNT_NAME), headers=headers)
+    all_users = pagination.offset('https://{0}.pagerduty.com/api/v1/users'.format(CONFIG.PAGERDUTY_ACCOUNT_NAME),
+                                  items=lambda response: response.json()['users'],
+                                  total=lambda response: response.json()['total'],
+                                  headers=headers)
 
-    return [user['email'] for user in response.json()['users']]
+    return [user['email'] for user in all_users]
 
-@pytest.mark.parametrize("email_address", _all_pagerduty_users())
+@pytest.mark.parametrize("email_address", inventory.register(_all_pagerduty_users))
 def test_unknown_pagerduty_user(email_address):
     """
     Connects to pager duty using the supplied account name
@@ -33,4 +36,4 @@ def test_unknown_pagerduty_user(email_address):
     and checks that there aren't any users with an email address not in the
     PAGERDUTY_VALID_EMAILS list
     """
-    assert email_address in CONFIG.PAGERDUTY_VALID_EMAILS
+    assert email_address in CONFIG.allowlist('PAGERDUTY_VALID_EMAILS')
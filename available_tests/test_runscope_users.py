@@ -35,12 +35,12 @@ RUNSCOPE_VALID_EMAILS       List         A list of email addresses for valid Run
 
 """
 
-import os
-import imp
 import pytest
-import requests
 
-CONFIG = imp.load_source('config', os.environ['WATCHDOG_CONFIG_LOCATION'])
+from watchdogs import client, inventory
+from watchdogs.config import load_config
+
+CONFIG = load_config()
 
 def _all_active_runscope_users():
     """
@@ -49,12 +49,12 @@ def _all_active_runscope_users():
     """
 
     uri = "https://api.runscope.com/teams/{0}/people".format(CONFIG.RUNSCOPE_TEAM_ID)
-    response = requests.get(uri, headers={'Authorization': 'bearer {0}'.format(CONFIG.RUNSCOPE_ACCESS_TOKEN)})
+    response = client.get(uri, headers={'Authorization': 'bearer {0}'.format(CONFIG.RUNSCOPE_ACCESS_TOKEN)})
     return [user['email'] for user in response.json()['data']]
 
-@pytest.mark.parametrize("email", _all_active_runscope_users())
+@pytest.mark.parametrize("email", inventory.register(_all_active_runscope_users))
 def test_runscope_user(email):
     """
     Assert that all email addresses of all users in Runscope are known
     """
-    assert email in CONFIG.RUNSCOPE_VALID_EMAILS
+    assert email in CONFIG.allowlist('RUNSCOPE_VALID_EMAILS')
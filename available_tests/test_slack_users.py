@@ -23,7 +23,9 @@ SLACK_EXCEPTIONS        dict            A dictionary of email address: Exception
                                             }
                                           }
 
-                                        The key is a regaulr expression of a match
+                                        The key is a regaulr expression of a match. If more
+                                        than one matches an email address the first
+                                        declared is used (Use an OrderedDict on Python 2)
 
                                         The value is a dictionary that supports the following parameters:
 
@@ -37,50 +39,73 @@ SLACK_EXCEPTIONS        dict            A dictionary of email address: Exception
 
 """
 
-import re
-import os
-import imp
-import time
-import requests
+from collections import namedtuple
+
 import pytest
 
-CONFIG = imp.load_source('config', os.environ['WATCHDOG_CONFIG_LOCATION'])
+from watchdogs import client, inventory, pagination
+from watchdogs.config import load_config
+
+CONFIG = load_config()
+
+# The number of members to request per page (Slack recommends no more than 200)
+PAGE_SIZE = 200
+
+# The fields of a member that the test uses
+SlackUser = namedtuple('SlackUser', ['email', 'name', 'has_2fa', 'is_ultra_restricted'])
+
+def _slack_user(member):
+    """
+    Projects a member returned by the Slack API down to a SlackUser. Members
+    without an email address (e.g. some guests) get an empty one, so that
+    they're reported as unknown.
+    """
+    return SlackUser(email=member.get('profile', {}).get('email', '').lower(),
+                     name=member['name'],
+                     has_2fa=member.get('has_2fa', False),
+                     is_ultra_restricted=member.get('is_ultra_restricted', False))
 
 def _all_active_slack_users(auth_token=CONFIG.SLACK_AUTH_TOKEN):
     """
-    Returns a list of active slack users, each represented as a dictionary.
+    Returns (email, SlackUser) for each active slack user, requesting a page of
+    members at a time
     (See https://api.slack.com/methods/users.list for fields)
     """
-    uri = 'https://slack.com/api/users.list?token=' + auth_token
-    response = requests.get(uri)
-    all_slack_users = response.json()
-    all_active_slack_users = [(member['profile']['email'].lower(), member) for member in all_slack_users['members'] if not member['deleted'] and member['id'] != 'USLACKBOT' and not member['is_bot']]
+    uri = 'https://slack.com/api/users.list'
+
+    def page(cursor=None):
+        params = {'token': auth_token, 'limit': PAGE_SIZE}
+        if cursor:
+            params['cursor'] = cursor
+        return client.get(uri, params=params)
+
+    members = pagination.cursor(first_page=page, next_page=page,
+                                items=lambda response: response.json()['members'],
+                                next_cursor=lambda response: response.json().get('response_metadata', {}).get('next_cursor'))
+    all_active_slack_users = [(slack_user.email, slack_user) for slack_user in
+                              (_slack_user(member) for member in members
+                               if not member['deleted'] and member['id'] != 'USLACKBOT' and not member['is_bot'])]
+    CONFIG.exception_policy('SLACK_EXCEPTIONS').evaluate(email for email, _ in all_active_slack_users)
     return all_active_slack_users
 
-@pytest.mark.parametrize("email,slack_user", _all_active_slack_users())
+@pytest.mark.parametrize("email,slack_user", inventory.register(_all_active_slack_users))
 def test_slack_user(email,slack_user):
     """
     Asserts that an email address is either in SLACK_VALID_EMAILS or is a key in
     SLACK_EXCEPTIONS and that the 'allowed_until' field is after todays date
     """
-    exception_match = None
-
     # Either it's an exception or
-    for EXCEPTION in CONFIG.SLACK_EXCEPTIONS:
-        if re.match(EXCEPTION, email):
-            exception_match = CONFIG.SLACK_EXCEPTIONS[EXCEPTION]
+    exception_match = CONFIG.exception_policy('SLACK_EXCEPTIONS').match(email)
 
     if exception_match is not None:
-        if 'allowed_until' in exception_match:
-            valid_until = time.strptime(exception_match['allowed_until'], "%d/%m/%Y")
-            assert time.gmtime() <= valid_until
+        assert not exception_match.expired()
 
-        if 'single_channel' in exception_match:
-            assert slack_user['is_ultra_restricted']
+        if 'single_channel' in exception_match.options:
+            assert slack_user.is_ultra_restricted
 
-        if 'prefix' in exception_match:
-            assert slack_user['name'].startswith(exception_match['prefix'])
+        if 'prefix' in exception_match.options:
+            assert slack_user.name.startswith(exception_match.options['prefix'])
 
     else:
-        assert email in CONFIG.SLACK_VALID_EMAILS
-        assert slack_user['has_2fa']
\ No newline at end of file
+        assert email in CONFIG.allowlist('SLACK_VALID_EMAILS')
+        assert slack_user.has_2fa
\ No newline at end of file
@@ -0,0 +1,62 @@
+"""
+Root py.test configuration for watchdogs.
+
+Having a conftest.py in the root of the repository makes py.test add it to
+sys.path, so that the tests in available_tests/ (and symlinked in to
+enabled_tests/) can import the shared watchdogs package.
+
+It also prefetches the inventories of every test module concurrently before
+they are collected (See watchdogs/inventory.py), and sets up the HTTP cache if
+it's configured (See watchdogs/httpcache.py).
+"""
+import os
+
+import pytest
+
+from watchdogs import client, facebook, inventory
+from watchdogs.config import load_config
+
+# Test modules found by py.test that haven't been imported yet
+_PENDING_MODULES = []
+
+
+def pytest_configure(config):
+    """
+    Caches HTTP responses (and Facebook app access tokens) in
+    WATCHDOG_HTTP_CACHE_DIR, if it's set in config.py
+    """
+    if 'WATCHDOG_CONFIG_LOCATION' not in os.environ:
+        return
+    watchdog_config = load_config()
+    client.configure_cache(getattr(watchdog_config, 'WATCHDOG_HTTP_CACHE_DIR', None),
+                           getattr(watchdog_config, 'WATCHDOG_HTTP_CACHE_TTLS', None),
+                           getattr(watchdog_config, 'WATCHDOG_HTTP_CACHE_MAX_AGE', None))
+    facebook.configure_token_cache(getattr(watchdog_config, 'WATCHDOG_HTTP_CACHE_DIR', None))
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_collect_file(parent):
+    """
+    Keeps track of every test module py.test finds. All the modules in a
+    directory (or on the command line) are found before any of them are
+    collected.
+    """
+    outcome = yield
+    _PENDING_MODULES.extend(node for node in outcome.get_result() or [] if isinstance(node, pytest.Module))
+
+
+def pytest_collectstart(collector):
+    """
+    Before a test module is collected, import all the modules found so far so
+    that they register their inventories, then fetch all of them at once.
+    """
+    if not isinstance(collector, pytest.Module):
+        return
+
+    while _PENDING_MODULES:
+        try:
+            _PENDING_MODULES.pop().obj
+        except (Exception, pytest.skip.Exception):
+            # Reported as normal when py.test collects the module
+            pass
+    inventory.prefetch_all()
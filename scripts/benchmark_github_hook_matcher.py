@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""
+Compares checking github hooks against GITHUB_ALLOWED_HOOKS with the compiled
+HookAllowlist against testing dictionary_match with every allowed hook.
+
+Generates an allowlist shaped like the documented config (a handful of web
+hook rules plus one email rule per LDAP address) and a set of hooks, verifies
+that both approaches agree and prints the time each takes.
+
+Usage (from the root of the repository):
+
+    python scripts/benchmark_github_hook_matcher.py [RULES] [HOOKS]
+
+As the linear approach takes minutes at 10k x 10k it's timed against a sample
+of the hooks and extrapolated.
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from watchdogs.matching import HookAllowlist, dictionary_match
+
+LINEAR_SAMPLE_SIZE = 200
+
+
+def generate_rules(count):
+    rules = [{'config': {'domain': 'notify.travis-ci.org', 'user': 'myuser'}},
+             {'config': {'url': 'https://beamly.slack.com/services/hooks/github?token=123456789ABCDEFG'}},
+             {'config': {'url': 'http://hubot.beamly.com/hubot/gh-pull-requests'}},
+             {'name': 'web', 'active': True, 'config': {'url': 'https://ci.beamly.com/'}}]
+    rules += [{'name': 'email', 'config': {'address': 'user{0}@beamly.com'.format(index)}}
+              for index in range(count - len(rules))]
+    return rules
+
+
+def generate_hooks(count, rule_count):
+    hooks = []
+    for index in range(count):
+        kind = index % 4
+        if kind == 0:
+            address = 'user{0}@beamly.com'.format(random.randint(0, rule_count * 2))
+            hooks.append({'name': 'email', 'active': True, 'events': ['push'], 'config': {'address': address}})
+        elif kind == 1:
+            hooks.append({'name': 'travis', 'active': True, 'events': ['push'],
+                          'config': {'domain': 'notify.travis-ci.org', 'user': random.choice(['myuser', 'other'])}})
+        elif kind == 2:
+            hooks.append({'name': 'web', 'active': random.choice([True, False]), 'events': ['push'],
+                          'config': {'url': 'https://ci.beamly.com/job/{0}/build'.format(index)}})
+        else:
+            hooks.append({'name': 'web', 'active': True, 'events': ['push'],
+                          'config': {'url': 'https://unknown.example.com/{0}'.format(index)}})
+    return hooks
+
+
+def main(rule_count=10000, hook_count=10000):
+    random.seed(0)
+    rules = generate_rules(rule_count)
+    hooks = generate_hooks(hook_count, rule_count)
+
+    start = time.time()
+    allowlist = HookAllowlist(rules)
+    compile_time = time.time() - start
+
+    start = time.time()
+    indexed = [allowlist.matches(hook) for hook in hooks]
+    indexed_time = time.time() - start
+
+    sample = random.sample(range(hook_count), min(LINEAR_SAMPLE_SIZE, hook_count))
+    start = time.time()
+    linear = dict((index, any(dictionary_match(rule, hooks[index]) for rule in rules)) for index in sample)
+    linear_time = (time.time() - start) * hook_count / len(sample)
+
+    mismatches = [index for index in sample if linear[index] != indexed[index]]
+
+    print('{0} allowed hooks x {1} hooks ({2} allowed)'.format(rule_count, hook_count, sum(indexed)))
+    print('HookAllowlist:     {0:.3f}s ({1:.3f}s to compile)'.format(indexed_time + compile_time, compile_time))
+    print('dictionary_match:  {0:.3f}s (extrapolated from {1} hooks)'.format(linear_time, len(sample)))
+    print('Speedup:           {0:.0f}x'.format(linear_time / (indexed_time + compile_time)))
+    print('Mismatches:        {0}'.format(len(mismatches)))
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
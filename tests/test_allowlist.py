@@ -0,0 +1,61 @@
+"""
+Tests for watchdogs/allowlist.py. Run with py.test tests/
+"""
+from watchdogs.allowlist import AllowList
+
+
+def test_case_is_ignored():
+    allowlist = AllowList(['Alice@Example.com'])
+    assert 'alice@example.com' in allowlist
+    assert 'ALICE@EXAMPLE.COM' in allowlist
+    assert 'bob@example.com' not in allowlist
+
+
+def test_case_sensitive():
+    allowlist = AllowList(['Alice@Example.com'], case_sensitive=True)
+    assert 'Alice@Example.com' in allowlist
+    assert 'alice@example.com' not in allowlist
+
+
+def test_plus_addressing():
+    allowlist = AllowList(['alice@example.com', 'bob+admin@example.com'], plus_addressing=True)
+    assert 'alice+slack@example.com' in allowlist
+    assert 'Alice+Slack@Example.com' in allowlist
+    assert 'bob@example.com' in allowlist
+    assert 'bob+other@example.com' in allowlist
+
+
+def test_plus_tags_matter_without_plus_addressing():
+    allowlist = AllowList(['alice@example.com', 'bob+admin@example.com'])
+    assert 'alice+slack@example.com' not in allowlist
+    assert 'bob+admin@example.com' in allowlist
+    assert 'bob@example.com' not in allowlist
+
+
+def test_domain_aliases():
+    allowlist = AllowList(['alice@example.com', 'bob@Example.CO.UK'], domain_aliases={'Example.co.uk': 'example.com'})
+    assert 'alice@example.co.uk' in allowlist
+    assert 'bob@example.com' in allowlist
+    assert 'alice@example.org' not in allowlist
+
+
+def test_values_that_arent_emails():
+    allowlist = AllowList(['Alice', 'U123+x', 42], plus_addressing=True, domain_aliases={'a': 'b'})
+    assert 'alice' in allowlist
+    assert 'U123+x' in allowlist
+    assert 'U123' not in allowlist
+    assert 42 in allowlist
+    assert '42' not in allowlist
+    assert None not in allowlist
+
+
+def test_dictionary_keys():
+    assert 'alice' in AllowList({'Alice': {'description': 'Admin'}})
+
+
+def test_matches():
+    allowlist = AllowList(['alice@example.com', 'bob@example.com'], plus_addressing=True)
+    assert allowlist.matches(['Alice+o365@example.com', 'carol@example.com', 'alice@example.com']) == \
+        frozenset(['alice@example.com'])
+    assert allowlist.matches(['carol@example.com']) == frozenset()
+    assert allowlist.matches([]) == frozenset()
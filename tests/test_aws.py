@@ -0,0 +1,61 @@
+"""
+Tests for watchdogs/aws.py. Run with py.test tests/
+"""
+import pytest
+
+pytest.importorskip('boto')
+
+from watchdogs import aws  # pylint: disable=wrong-import-position
+
+
+def _pages(pages, requests, response_key='list_users_response', result_key='list_users_result', items_key='users'):
+    """
+    Returns a fake IAM request that answers each marker with the next page
+    """
+    def request(marker):
+        requests.append(marker)
+        index = len(requests) - 1
+        result = {items_key: pages[index]}
+        if index < len(pages) - 1:
+            result['is_truncated'] = 'true'
+            result['marker'] = 'marker{0}'.format(index + 1)
+        else:
+            result['is_truncated'] = 'false'
+        return {response_key: {result_key: result}}
+    return request
+
+
+def test_iam_pages_follow_the_marker_until_not_truncated():
+    requests = []
+    users = aws._iam_pages(_pages([['a', 'b'], ['c'], ['d']], requests),
+                           'list_users_response', 'list_users_result', 'users')
+    assert list(users) == ['a', 'b', 'c', 'd']
+    assert requests == [None, 'marker1', 'marker2']
+
+
+def test_iam_pages_single_page():
+    requests = []
+    users = aws._iam_pages(_pages([['a']], requests), 'list_users_response', 'list_users_result', 'users')
+    assert list(users) == ['a']
+    assert requests == [None]
+
+
+class FakeIAMConnection(object):
+    def __init__(self, pages):
+        self.params = []
+        self._request = _pages(pages, [], 'get_account_authorization_details_response',
+                               'get_account_authorization_details_result', 'user_detail_list')
+
+    def get_response(self, action, params, list_marker=None):
+        assert action == 'GetAccountAuthorizationDetails'
+        assert list_marker == aws._USER_DETAIL_LISTS
+        self.params.append(dict(params))
+        return self._request(params.get('Marker'))
+
+
+def test_iam_users_with_details_pages_through_authorization_details(monkeypatch):
+    connection = FakeIAMConnection([[{'user_name': 'alice'}], [{'user_name': 'bob'}]])
+    monkeypatch.setattr(aws, 'iam_connection', lambda role_arn: connection)
+    assert [user['user_name'] for user in aws.iam_users(details=True)] == ['alice', 'bob']
+    assert connection.params == [{'Filter.member.1': 'User', 'MaxItems': aws.IAM_PAGE_SIZE},
+                                 {'Filter.member.1': 'User', 'MaxItems': aws.IAM_PAGE_SIZE, 'Marker': 'marker1'}]
@@ -0,0 +1,40 @@
+"""
+Tests for watchdogs/concurrency.py. Run with py.test tests/
+"""
+import time
+
+from watchdogs.concurrency import RateLimitThrottle, parallel_map
+
+
+class FakeResponse(object):
+    def __init__(self, status_code=200, **headers):
+        self.status_code = status_code
+        self.headers = dict((name.replace('_', '-'), value) for name, value in headers.items())
+
+
+def test_parallel_map_keeps_the_order_of_items():
+    assert parallel_map(lambda item: item * 2, range(20), 4) == [item * 2 for item in range(20)]
+
+
+def test_low_rate_limit_runs_requests_one_at_a_time():
+    throttle = RateLimitThrottle(max_concurrency=8, low_watermark=10)
+    throttle.update(FakeResponse(X_RateLimit_Remaining='5'))
+    assert throttle._concurrency == 1
+    throttle.update(FakeResponse(X_RateLimit_Remaining='500'))
+    assert throttle._concurrency == 8
+
+
+def test_exhausted_rate_limit_is_retried_after_the_reset():
+    throttle = RateLimitThrottle()
+    reset = time.time() + 30
+    assert throttle.update(FakeResponse(403, X_RateLimit_Remaining='0', X_RateLimit_Reset=str(reset)))
+    assert throttle._resume_at == reset
+
+
+def test_rate_limit_headers_that_dont_parse_are_ignored():
+    throttle = RateLimitThrottle(max_concurrency=8)
+    assert not throttle.update(FakeResponse(X_RateLimit_Remaining='unlimited', X_RateLimit_Reset='soon'))
+    assert throttle._concurrency == 8
+    assert throttle._resume_at == 0
+    assert throttle.update(FakeResponse(429, X_RateLimit_Remaining='0', X_RateLimit_Reset='soon'))
+    assert throttle._resume_at > time.time()
@@ -0,0 +1,51 @@
+"""
+Tests for watchdogs/github.py. Run with py.test tests/
+"""
+from watchdogs.github import Repository, RepositoryScanState
+
+
+def _repo(name, pushed_at='2020-01-01'):
+    return Repository('org', name, False, 'public', pushed_at, '2020-01-01')
+
+
+class FakeScan(object):
+    """
+    Returns the saved result when called with the saved entry (as a 304 would)
+    """
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, repo, previous):
+        self.calls.append((repo.name, previous is not None))
+        if previous is not None:
+            return previous['result'], previous['etag']
+        return [repo.name, repo.pushed_at], 'etag-' + repo.pushed_at
+
+
+def test_only_changed_repositories_are_checked(tmpdir):
+    path = str(tmpdir.join('state.json'))
+    RepositoryScanState(path, 3600).scan([_repo('a'), _repo('b')], FakeScan())
+
+    scan = FakeScan()
+    results = RepositoryScanState(path, 3600).scan([_repo('a'), _repo('b', '2020-02-01')], scan)
+    assert scan.calls == [('b', True)]
+    assert results == [['a', '2020-01-01'], ['b', '2020-01-01']]
+
+
+def test_revalidate_checks_every_repository(tmpdir):
+    path = str(tmpdir.join('state.json'))
+    RepositoryScanState(path, 3600).scan([_repo('a'), _repo('b')], FakeScan())
+
+    scan = FakeScan()
+    results = RepositoryScanState(path, 3600).scan([_repo('a'), _repo('b', '2020-02-01')], scan, revalidate=True)
+    assert sorted(scan.calls) == [('a', True), ('b', False)]
+    assert results == [['a', '2020-01-01'], ['b', '2020-02-01']]
+
+
+def test_revalidated_results_are_fetched_again_after_the_full_rescan_interval(tmpdir):
+    path = str(tmpdir.join('state.json'))
+    RepositoryScanState(path, 3600).scan([_repo('a')], FakeScan())
+
+    scan = FakeScan()
+    RepositoryScanState(path, 0).scan([_repo('a')], scan, revalidate=True)
+    assert scan.calls == [('a', False)]
@@ -0,0 +1,59 @@
+"""
+Tests for watchdogs/matching.py. Run with py.test tests/
+"""
+import random
+
+from watchdogs.matching import HookAllowlist, dictionary_match
+
+
+def _allowed(rules, hook):
+    return any(dictionary_match(rule, hook) for rule in rules)
+
+
+def test_empty_nested_dictionary_requires_the_key():
+    rules = [{'config': {}}]
+    allowlist = HookAllowlist(rules)
+    assert allowlist.matches({'name': 'web', 'config': {'url': 'https://example.com'}})
+    assert not allowlist.matches({'name': 'web'})
+    assert not HookAllowlist([{'config': {'nested': {}}}]).matches({'config': 'not a dictionary'})
+
+
+def test_empty_rule_allows_every_hook():
+    assert HookAllowlist([{}]).matches({'name': 'web'})
+
+
+def test_no_rules_allow_nothing():
+    assert not HookAllowlist([]).matches({'name': 'web'})
+
+
+def test_substring_and_exact_leaves():
+    allowlist = HookAllowlist([{'name': 'web', 'active': True, 'config': {'url': 'https://ci.example.com/'}}])
+    assert allowlist.matches({'name': 'web', 'active': True, 'config': {'url': 'https://ci.example.com/job/1'}})
+    assert not allowlist.matches({'name': 'web', 'active': False, 'config': {'url': 'https://ci.example.com/job/1'}})
+    assert not allowlist.matches({'name': 'web', 'active': True, 'config': {'url': 'https://other.example.com/'}})
+
+
+def _random_value(rng, depth):
+    choice = rng.randint(0, 5 if depth < 2 else 3)
+    if choice == 0:
+        return rng.choice(['a', 'ab', 'b', 'abc', ''])
+    if choice == 1:
+        return rng.choice([True, False, 1, 0])
+    if choice == 2:
+        return [rng.choice(['a', 'b'])]
+    if choice == 3:
+        return None
+    return dict((rng.choice(['name', 'config', 'url', 'active']), _random_value(rng, depth + 1))
+                for _ in range(rng.randint(0, 2)))
+
+
+def test_matches_dictionary_match():
+    rng = random.Random(0)
+    for _ in range(300):
+        rules = [_random_value(rng, 0) for _ in range(rng.randint(0, 4))]
+        rules = [rule for rule in rules if isinstance(rule, dict)]
+        allowlist = HookAllowlist(rules)
+        for _ in range(20):
+            hook = _random_value(rng, 0)
+            if isinstance(hook, dict):
+                assert allowlist.matches(hook) == _allowed(rules, hook), (rules, hook)
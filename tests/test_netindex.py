@@ -0,0 +1,69 @@
+"""
+Tests for watchdogs/netindex.py. Run with py.test tests/
+"""
+import random
+
+import pytest
+
+from watchdogs.netindex import NetworkIndex, parse_network
+
+
+def test_exact_match():
+    index = NetworkIndex(['10.0.0.0/8', '192.168.1.1'])
+    assert '10.0.0.0/8' in index
+    assert '192.168.1.1' in index
+    assert '192.168.1.1/32' in index
+    assert '192.168.1.2' not in index
+
+
+def test_contained_networks_are_covered():
+    index = NetworkIndex(['10.0.0.0/8'])
+    assert '10.1.2.0/24' in index
+    assert '10.255.255.255' in index
+    assert '11.0.0.0/24' not in index
+
+
+def test_overlapping_networks_that_arent_contained_arent_covered():
+    index = NetworkIndex(['10.0.0.0/24'])
+    assert '10.0.0.0/16' not in index
+    assert '10.0.0.128/23' not in index
+
+
+def test_adjacent_networks_are_merged():
+    index = NetworkIndex(['10.0.0.0/17', '10.0.128.0/17'])
+    assert len(index) == 1
+    assert '10.0.0.0/16' in index
+
+
+def test_ipv6():
+    index = NetworkIndex(['2001:db8::/32'])
+    assert '2001:db8:1::/48' in index
+    assert '2001:db9::/48' not in index
+    assert '10.0.0.0/8' not in index
+    assert '::/0' in NetworkIndex(['::/0'])
+    assert '::/0' not in index
+    assert '0.0.0.0/0' not in NetworkIndex(['::/0'])
+
+
+def test_entries_that_arent_networks_are_ignored():
+    index = NetworkIndex(['sg-12345', '10.0.0.0/33', '10.0.0.0/8'])
+    assert len(index) == 1
+    assert index.covers(['10.0.0.1', 'sg-12345', '10.0.0.0/33']) == [True, False, False]
+    assert parse_network('not a network') is None
+
+
+def _random_network(rng):
+    return '10.0.0.{0}/{1}'.format(rng.randint(0, 255), rng.randint(24, 32))
+
+
+def test_matches_ipaddress():
+    ipaddress = pytest.importorskip('ipaddress')
+    rng = random.Random(0)
+    for _ in range(200):
+        networks = [_random_network(rng) for _ in range(rng.randint(0, 6))]
+        index = NetworkIndex(networks)
+        allowed = [ipaddress.ip_network(u'' + network, strict=False) for network in networks]
+        for _ in range(20):
+            network = ipaddress.ip_network(u'' + _random_network(rng), strict=False)
+            covered = all(any(address in allowed_network for allowed_network in allowed) for address in network)
+            assert (str(network) in index) == covered, (networks, network)
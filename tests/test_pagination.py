@@ -0,0 +1,88 @@
+"""
+Tests for watchdogs/pagination.py. Run with py.test tests/
+"""
+import pytest
+
+from watchdogs import pagination
+
+
+@pytest.fixture(autouse=True)
+def fake_get(monkeypatch):
+    """
+    Makes each "response" the query parameters it was requested with
+    """
+    monkeypatch.setattr(pagination, '_get', lambda url, params=None, **kwargs: params)
+
+
+def test_page_number_stops_at_a_short_page():
+    pages = {1: ['a', 'b'], 2: ['c', 'd'], 3: ['e']}
+    assert list(pagination.page_number('url', items=lambda params: pages.get(params['page'], []))) == \
+        ['a', 'b', 'c', 'd', 'e']
+
+
+def test_page_number_stops_when_the_page_is_ignored():
+    assert list(pagination.page_number('url', items=lambda params: ['a', 'b'])) == ['a', 'b']
+
+
+def test_offset_stops_when_the_offset_is_ignored():
+    assert list(pagination.offset('url', items=lambda params: ['a', 'b'], limit=2)) == ['a', 'b']
+
+
+def test_paging_stops_after_max_pages(monkeypatch):
+    monkeypatch.setattr(pagination, 'MAX_PAGES', 5)
+    with pytest.raises(pagination.PaginationError):
+        list(pagination.page_number('url', items=lambda params: [params['page']]))
+
+
+class FakeResponse(object):
+    def __init__(self, items, links=None, next_cursor=None):
+        self.items = items
+        self.links = links or {}
+        self.next_cursor = next_cursor
+
+    def json(self):
+        return self.items
+
+    def raise_for_status(self):
+        pass
+
+
+def test_link_header_stops_when_the_next_link_repeats(monkeypatch):
+    responses = {'first': FakeResponse(['a'], {'next': {'url': 'second'}}),
+                 'second': FakeResponse(['b'], {'next': {'url': 'second'}})}
+    monkeypatch.setattr(pagination, '_get', lambda url, **kwargs: responses[url])
+    assert list(pagination.link_header('first')) == ['a', 'b']
+
+
+def test_link_header_stops_after_max_pages(monkeypatch):
+    monkeypatch.setattr(pagination, 'MAX_PAGES', 5)
+    monkeypatch.setattr(pagination, '_get',
+                        lambda url, **kwargs: FakeResponse([url], {'next': {'url': url + 'x'}}))
+    with pytest.raises(pagination.PaginationError):
+        list(pagination.link_header('u'))
+
+
+def test_link_header_refuses_too_many_pages(monkeypatch):
+    monkeypatch.setattr(pagination, 'MAX_PAGES', 5)
+    monkeypatch.setattr(pagination, '_get',
+                        lambda url, **kwargs: FakeResponse([url], {'last': {'url': 'https://api/x?page=6'}}))
+    with pytest.raises(pagination.PaginationError):
+        list(pagination.link_header('https://api/x'))
+
+
+def test_cursor_stops_when_the_cursor_repeats():
+    pages = {None: (['a'], 'c1'), 'c1': (['b'], 'c2'), 'c2': (['c'], 'c1')}
+    responses = dict((key, FakeResponse(items, next_cursor=next_cursor))
+                     for key, (items, next_cursor) in pages.items())
+    assert list(pagination.cursor(lambda: responses[None], lambda page_cursor: responses[page_cursor],
+                                  items=lambda response: response.items,
+                                  next_cursor=lambda response: response.next_cursor)) == ['a', 'b', 'c']
+
+
+def test_cursor_stops_after_max_pages(monkeypatch):
+    monkeypatch.setattr(pagination, 'MAX_PAGES', 5)
+    with pytest.raises(pagination.PaginationError):
+        list(pagination.cursor(lambda: FakeResponse([0], next_cursor=1),
+                               lambda page_cursor: FakeResponse([page_cursor], next_cursor=page_cursor + 1),
+                               items=lambda response: response.items,
+                               next_cursor=lambda response: response.next_cursor))
@@ -0,0 +1,89 @@
+"""
+Tests for watchdogs/policy.py. Run with py.test tests/
+"""
+from collections import OrderedDict
+
+from watchdogs import policy
+from watchdogs.policy import ExceptionPolicy
+
+
+def _policy(*keys, **kwargs):
+    return ExceptionPolicy(OrderedDict((key, {'description': key}) for key in keys), **kwargs)
+
+
+def test_first_declared_exception_wins():
+    exceptions = _policy('.*@example.com', 'alice@example.com')
+    assert exceptions.match('alice@example.com').key == '.*@example.com'
+
+    exceptions = _policy('alice@example.com', '.*@example.com')
+    assert exceptions.match('alice@example.com').key == 'alice@example.com'
+
+
+def test_keys_match_the_start_of_the_value():
+    exceptions = _policy('alice')
+    assert exceptions.match('alice@example.com').key == 'alice'
+    assert exceptions.match('bob.alice@example.com') is None
+
+
+def test_keys_with_groups_identify_the_right_exception():
+    exceptions = _policy('(a)(b)c', '(x|y)z', 'q')
+    assert exceptions.match('abc').key == '(a)(b)c'
+    assert exceptions.match('yz').key == '(x|y)z'
+    assert exceptions.match('q').key == 'q'
+    assert exceptions.match('ab') is None
+
+
+def test_keys_are_chunked_within_the_group_limit():
+    keys = ['user{0}@(example|test).com'.format(index) for index in range(200)]
+    exceptions = _policy(*keys)
+    assert len(exceptions._patterns) > 1
+    for pattern, _, _ in exceptions._patterns:
+        assert pattern.groups <= policy.MAX_GROUPS
+    for index, key in enumerate(keys):
+        assert exceptions.match('user{0}@test.com'.format(index)).key == key
+
+
+def test_precedence_is_kept_across_chunks():
+    keys = ['shared.*'] + ['unused{0}(x)'.format(index) for index in range(60)] + ['shared-late', 'late']
+    exceptions = _policy(*keys)
+    assert len(exceptions._patterns) > 1
+    assert exceptions.match('shared-late').key == 'shared.*'
+    assert exceptions.match('late').key == 'late'
+
+
+def test_inline_flags_only_apply_to_their_key():
+    exceptions = _policy('bob@example.com', '(?i)alice@example.com', 'carol@example.com')
+    assert exceptions.match('ALICE@example.com').key == '(?i)alice@example.com'
+    assert exceptions.match('CAROL@example.com') is None
+    assert exceptions.match('carol@example.com').key == 'carol@example.com'
+
+
+def test_standalone_keys_keep_their_declared_position():
+    exceptions = _policy('(?i)ALICE.*', 'alice@example.com')
+    assert exceptions.match('alice@example.com').key == '(?i)ALICE.*'
+
+    exceptions = _policy('alice@example.com', '(?i)ALICE.*')
+    assert exceptions.match('alice@example.com').key == 'alice@example.com'
+
+
+def test_named_groups_and_backreferences():
+    exceptions = _policy('(?P<user>[a-z]+)@(?P=user).com', '(?P<user>[a-z]+)@other.com', r'(a)\1')
+    assert exceptions.match('bob@bob.com').key == '(?P<user>[a-z]+)@(?P=user).com'
+    assert exceptions.match('bob@other.com').key == '(?P<user>[a-z]+)@other.com'
+    assert exceptions.match('aa').key == r'(a)\1'
+    assert exceptions.match('bob@alice.com') is None
+
+
+def test_literal_keys():
+    exceptions = _policy('a.b', 'a.b', literal=True)
+    assert exceptions.match('a.b') is exceptions.exceptions[0]
+    assert exceptions.match('axb') is None
+
+
+def test_expiry():
+    exceptions = ExceptionPolicy({'alice': {'allowed_until': '02/01/1970'}})
+    exception = exceptions.match('alice')
+    assert exception.allowed_until == 24 * 60 * 60
+    assert not exception.expired(now=0)
+    assert exception.expired(now=2 * 24 * 60 * 60)
+    assert exceptions.expiring_within(2, now=0) == [exception]
@@ -0,0 +1,6 @@
+"""
+Shared helpers used by the watchdogs tests in available_tests/
+
+The repository root is added to sys.path by conftest.py, so tests can simply
+`import watchdogs` when run with py.test.
+"""
@@ -0,0 +1,93 @@
+"""
+Allowlists of known identities (email addresses, usernames, IDs...) from
+config.py.
+
+Checking whether a value is in a list takes time proportional to the length
+of the list, so checking every user of a provider against every user in an
+organisation takes quadratic time. An AllowList normalizes the values in a
+list once in to a set, and normalizes each value checked against it the same
+way, so that checking a value takes constant time:
+
+- Case is ignored, unless case_sensitive is True
+- If plus_addressing is True, a "+tag" in an email address is ignored
+  (alice+slack@example.com is treated as alice@example.com)
+- domain_aliases maps email domains to the domain they are an alias of,
+  e.g. {'example.co.uk': 'example.com'}
+
+Tests normally get allowlists from the loaded config, which builds each one
+once and applies the options configured in config.py (See watchdogs/config.py):
+
+    assert email in CONFIG.allowlist('SLACK_VALID_EMAILS')
+"""
+try:
+    STRING_TYPES = (basestring,)
+except NameError:
+    STRING_TYPES = (str,)
+
+
+def _fold_case(value):
+    try:
+        return value.casefold()
+    except AttributeError:
+        # Python 2
+        return value.lower()
+
+
+class AllowList(object):
+    """
+    A set of normalized values. Values that aren't strings are kept as they are.
+    """
+
+    def __init__(self, values, case_sensitive=False, plus_addressing=False, domain_aliases=None):
+        """
+        :param values:          iterable    The allowed values. For a dictionary
+                                            these are its keys
+        :param case_sensitive:  bool        Whether case matters
+        :param plus_addressing: bool        Whether to ignore "+tag" in email addresses
+        :param domain_aliases:  dict        Email domains mapped to the domain
+                                            they are an alias of
+        """
+        self.case_sensitive = case_sensitive
+        self.plus_addressing = plus_addressing
+        self.domain_aliases = {}
+        for alias, domain in (domain_aliases or {}).items():
+            self.domain_aliases[self._fold(alias)] = self._fold(domain)
+        self._values = frozenset(self.normalize(value) for value in values)
+
+    def _fold(self, value):
+        return value if self.case_sensitive else _fold_case(value)
+
+    def normalize(self, value):
+        """
+        Returns value as it's stored in the allowlist
+        """
+        if not isinstance(value, STRING_TYPES):
+            return value
+        value = self._fold(value)
+        if '@' in value and (self.plus_addressing or self.domain_aliases):
+            local, _, domain = value.rpartition('@')
+            if self.plus_addressing:
+                local = local.split('+', 1)[0]
+            value = local + '@' + self.domain_aliases.get(domain, domain)
+        return value
+
+    def __contains__(self, value):
+        return self.normalize(value) in self._values
+
+    def matches(self, values):
+        """
+        Returns the normalized values in values that are allowed, e.g. which
+        of the addresses of a mailbox are known
+        :param values:  iterable    The values to check
+        :returns:       frozenset   The allowed values, empty if there are none
+        """
+        return self._values.intersection(self.normalize(value) for value in values)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __repr__(self):
+        return '<AllowList of {0} values>'.format(len(self._values))
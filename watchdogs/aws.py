@@ -0,0 +1,200 @@
+"""
+Shared AWS (boto) helpers.
+
+Several AWS accounts can be audited in one run by assuming a role in each of
+them with STS. Accounts are identified by the ARN of the role to assume, or
+None for the credentials boto is configured with (See
+http://boto.readthedocs.org/en/latest/boto_config_tut.html). The credentials
+for each role are cached until shortly before they expire.
+
+Connections are cached per account and region. boto connections aren't safe
+to use from more than one thread at a time, so each thread gets its own.
+"""
+import threading
+from collections import namedtuple, OrderedDict
+
+import boto
+import boto.ec2
+from boto.iam.connection import IAMConnection
+
+# The region used to list the other regions
+DISCOVERY_REGION = 'us-east-1'
+
+# Assumed role credentials are renewed when they expire within this many seconds
+CREDENTIAL_EXPIRY_MARGIN = 300
+
+ROLE_SESSION_NAME = 'watchdogs'
+
+DEFAULT_ACCOUNT = 'default'
+
+_CREDENTIALS = {}
+_CREDENTIAL_LOCKS = {}
+_LOCK = threading.Lock()
+_LOCAL = threading.local()
+
+
+def accounts(role_arns=None):
+    """
+    Returns the accounts to audit
+    :param role_arns:   list[str]   The ARNs of the roles to assume in each
+                                    account, or None to only audit the account
+                                    of the configured credentials
+    :returns:           OrderedDict Account IDs (or 'default') mapped to role ARNs
+    """
+    if not role_arns:
+        return OrderedDict([(DEFAULT_ACCOUNT, None)])
+    return OrderedDict((role_arn.split(':')[4], role_arn) for role_arn in role_arns)
+
+
+def assumed_role_credentials(role_arn):
+    """
+    Returns temporary credentials for a role, assuming it if there are no
+    cached credentials or they're about to expire
+    :param role_arn:    str             The ARN of the role
+    :returns:           Credentials     The credentials
+    """
+    with _LOCK:
+        lock = _CREDENTIAL_LOCKS.setdefault(role_arn, threading.Lock())
+    with lock:
+        credentials = _CREDENTIALS.get(role_arn)
+        if credentials is None or credentials.is_expired(time_offset_seconds=CREDENTIAL_EXPIRY_MARGIN):
+            credentials = boto.connect_sts().assume_role(role_arn, ROLE_SESSION_NAME).credentials
+            _CREDENTIALS[role_arn] = credentials
+        return credentials
+
+
+def _connection(key, role_arn, connect):
+    """
+    Returns this thread's cached connection for key, making a new one with
+    connect if there isn't one or the role's credentials have been renewed
+    """
+    credentials = assumed_role_credentials(role_arn) if role_arn is not None else None
+    connections = getattr(_LOCAL, 'connections', None)
+    if connections is None:
+        connections = _LOCAL.connections = {}
+    cached = connections.get(key)
+    if cached is None or cached[0] is not credentials:
+        kwargs = {}
+        if credentials is not None:
+            kwargs = {'aws_access_key_id': credentials.access_key,
+                      'aws_secret_access_key': credentials.secret_key,
+                      'security_token': credentials.session_token}
+        cached = connections[key] = (credentials, connect(**kwargs))
+    return cached[1]
+
+
+def ec2_connection(region, role_arn=None):
+    """
+    Returns an EC2 connection for a region
+    :param region:      str             The name of the region, e.g. 'eu-west-1'
+    :param role_arn:    str             The role to assume, or None
+    :returns:           EC2Connection   The connection
+    """
+    return _connection(('ec2', region, role_arn), role_arn,
+                       lambda **kwargs: boto.ec2.connect_to_region(region, **kwargs))
+
+
+def iam_connection(role_arn=None):
+    """
+    Returns an IAM connection
+    :param role_arn:    str             The role to assume, or None
+    :returns:           IAMConnection   The connection
+    """
+    return _connection(('iam', role_arn), role_arn, IAMConnection)
+
+
+def enabled_regions(role_arn=None):
+    """
+    Returns the names of the regions enabled for an account (Using the
+    DescribeRegions API)
+    :param role_arn:    str         The role to assume, or None
+    :returns:           list[str]   The region names
+    """
+    return sorted(region.name for region in ec2_connection(DISCOVERY_REGION, role_arn).get_all_regions())
+
+
+# The largest page size the IAM API allows
+IAM_PAGE_SIZE = 1000
+
+# The lists in a GetAccountAuthorizationDetails response for users
+_USER_DETAIL_LISTS = ('UserDetailList', 'GroupList', 'AttachedManagedPolicies', 'UserPolicyList')
+
+
+def _iam_pages(request, response_key, result_key, items_key):
+    """
+    Yields every item of a paginated IAM API, following the marker until a
+    response isn't truncated
+    :param request:         callable    Takes a marker (or None for the first
+                                        page) and returns the response
+    :param response_key:    str         e.g. 'list_users_response'
+    :param result_key:      str         e.g. 'list_users_result'
+    :param items_key:       str         e.g. 'users'
+    """
+    marker = None
+    while True:
+        result = request(marker)[response_key][result_key]
+        for item in result[items_key]:
+            yield item
+        if result.get('is_truncated') != 'true':
+            return
+        marker = result['marker']
+
+
+def iam_users(role_arn=None, details=False):
+    """
+    Yields every IAM user in an account, a page at a time
+    :param role_arn:    str         The role to assume, or None
+    :param details:     bool        If True users are listed with
+                                    GetAccountAuthorizationDetails, so that
+                                    each includes its groups (group_list),
+                                    attached policies (attached_managed_policies)
+                                    and inline policies (user_policy_list)
+    :returns:           generator   Dictionaries with a user_name for each user
+    """
+    connection = iam_connection(role_arn)
+    if not details:
+        return _iam_pages(lambda marker: connection.get_all_users(marker=marker, max_items=IAM_PAGE_SIZE),
+                          'list_users_response', 'list_users_result', 'users')
+
+    def request(marker):
+        params = {'Filter.member.1': 'User', 'MaxItems': IAM_PAGE_SIZE}
+        if marker is not None:
+            params['Marker'] = marker
+        return connection.get_response('GetAccountAuthorizationDetails', params, list_marker=_USER_DETAIL_LISTS)
+
+    return _iam_pages(request, 'get_account_authorization_details_response',
+                      'get_account_authorization_details_result', 'user_detail_list')
+
+class SecurityGroupGrant(namedtuple('SecurityGroupGrant', ['account', 'region', 'group_id', 'group_name',
+                                                           'protocol', 'from_port', 'to_port', 'cidr', 'rule_key'])):
+    """
+    A single grant of a security group rule, as plain strings so that it's
+    small and can be pickled. rule_key is the rule rendered as
+    "PROTOCOL-FROMPORT-TOPORT-CIDR".
+    """
+    __slots__ = ()
+
+    @property
+    def test_id(self):
+        """
+        A short ID for the grant that's stable between runs
+        """
+        return '{0}:{1}:{2}:{3}'.format(self.account, self.region, self.group_id, self.rule_key)
+
+
+def security_group_grants(account, region, group):
+    """
+    Flattens a security group in to one row per grant
+    :param account: str                         The account of the group
+    :param region:  str                         The region of the group
+    :param group:   SecurityGroup               The group
+    :returns:       list[SecurityGroupGrant]    The grants
+    """
+    grants = []
+    for rule in group.rules:
+        protocol, from_port, to_port = str(rule.ip_protocol).upper(), str(rule.from_port), str(rule.to_port)
+        for grant in rule.grants:
+            cidr = str(grant)
+            grants.append(SecurityGroupGrant(account, region, group.id, group.name, protocol, from_port, to_port, cidr,
+                                             '-'.join((protocol, from_port, to_port, cidr))))
+    return grants
@@ -0,0 +1,196 @@
+"""
+Shared HTTP client for the tests that talk to third party APIs.
+
+A drop in replacement for requests.get/requests.post:
+
+    from watchdogs import client
+
+    response = client.get(uri, headers=headers)
+
+Compared to calling requests directly:
+
+- Every host gets its own requests.Session, so connections are pooled and
+  kept alive rather than a new TCP/TLS connection being made per request
+- Requests time out (DEFAULT_TIMEOUT) rather than hanging forever
+- Connection errors, timeouts and 429/5xx responses of idempotent (GET, HEAD
+  and OPTIONS) requests are retried with a jittered exponential backoff.
+  Other requests are only retried if they're made with retry=True, e.g. POSTs
+  that only read data
+- Requests in flight to each host are throttled according to the rate limit
+  headers it returns (See watchdogs.concurrency.RateLimitThrottle)
+
+Cookies are never stored in the shared sessions, so pass any that are needed
+explicitly with each request.
+
+GET responses can also be cached on disk between runs and revalidated with
+conditional requests (See watchdogs/httpcache.py and configure_cache), except
+for streamed (stream=True) responses.
+"""
+import time
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from urllib.parse import urlparse
+    from http.cookiejar import DefaultCookiePolicy
+except ImportError:
+    from urlparse import urlparse
+    from cookielib import DefaultCookiePolicy
+
+from watchdogs.concurrency import RateLimitThrottle
+from watchdogs.httpcache import HTTPCache, DEFAULT_MAX_AGE, is_cacheable, to_response
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (10, 60)
+
+# Number of connections to keep open to each host
+POOL_SIZE = 32
+
+MAX_RETRIES = 4
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+# Methods that are retried unless retry=False
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+
+_SESSIONS = {}
+_THROTTLES = {}
+_LOCK = threading.Lock()
+_CACHE = None
+
+
+def _new_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['Accept-Encoding'] = 'gzip, deflate'
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+def get_session(host):
+    """
+    Returns the shared session used for requests to a host
+    :param host:    str                 A host name (and optional port)
+    :returns:       requests.Session    The session for host
+    """
+    with _LOCK:
+        if host not in _SESSIONS:
+            _SESSIONS[host] = _new_session()
+            _THROTTLES[host] = RateLimitThrottle(max_concurrency=POOL_SIZE)
+        return _SESSIONS[host]
+
+
+def get_throttle(host):
+    """
+    Returns the throttle applied to requests to a host
+    :param host:    str                 A host name (and optional port)
+    :returns:       RateLimitThrottle   The throttle for host
+    """
+    get_session(host)
+    return _THROTTLES[host]
+
+
+def configure_cache(directory, ttls=None, max_age=None):
+    """
+    Caches GET responses in a directory, or stops caching them, and prunes
+    the entries that haven't been used for max_age seconds
+    :param directory:   str     The directory to store responses in, or None
+                                to disable the cache
+    :param ttls:        dict    Host names mapped to the number of seconds
+                                their responses are used for without
+                                revalidating them (Default 0)
+    :param max_age:     int     The number of seconds unused entries are kept
+                                for (Default httpcache.DEFAULT_MAX_AGE)
+    """
+    global _CACHE
+    _CACHE = HTTPCache(directory, ttls, max_age=max_age or DEFAULT_MAX_AGE) if directory else None
+    if _CACHE is not None:
+        _CACHE.prune()
+
+
+def backoff(attempt):
+    """
+    Returns how long to wait before retrying a request, using "full jitter"
+    so that concurrent requests that failed together don't retry together
+    :param attempt: int     The number of attempts that have failed so far
+    :returns:       float   The number of seconds to wait
+    """
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def request(method, url, **kwargs):
+    """
+    Makes a request using the shared session for the host in url, or answers
+    it from the cache if one's configured. Takes the same arguments as
+    requests.request, and:
+    :param retry:   bool                Whether failed attempts are retried
+                                        (Default True for idempotent methods)
+    :returns:       requests.Response   The response to the final attempt
+    """
+    retry = kwargs.pop('retry', method.upper() in IDEMPOTENT_METHODS)
+    # Streamed responses are read by the caller, so can't be stored
+    cache = _CACHE if method.upper() == 'GET' and not kwargs.get('stream') else None
+    if cache is not None and not is_cacheable(url, kwargs.get('params')):
+        cache = None
+    if cache is not None:
+        key = cache.key(method, url, **kwargs)
+        entry = cache.load(key)
+        if entry is not None:
+            if cache.is_fresh(entry, url):
+                return to_response(entry)
+            kwargs['headers'] = cache.conditional_headers(entry, kwargs.get('headers'))
+        return cache.update(key, entry, _request(method, url, retry, **kwargs))
+    return _request(method, url, retry, **kwargs)
+
+
+def _request(method, url, retry, **kwargs):
+    kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+    host = urlparse(url).netloc
+    session = get_session(host)
+    throttle = get_throttle(host)
+
+    max_retries = MAX_RETRIES if retry else 0
+    attempt = 0
+    while True:
+        try:
+            with throttle:
+                response = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt >= max_retries:
+                raise
+            time.sleep(backoff(attempt))
+            attempt += 1
+            continue
+
+        # Rate limited: the throttle holds the retry back until the limit resets
+        if throttle.update(response) and attempt < max_retries:
+            response.close()
+            attempt += 1
+            continue
+
+        if response.status_code in RETRY_STATUSES and attempt < max_retries:
+            response.close()
+            time.sleep(backoff(attempt))
+            attempt += 1
+            continue
+
+        return response
+
+
+def get(url, **kwargs):
+    """
+    Makes a GET request. Takes the same arguments as requests.get
+    """
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    """
+    Makes a POST request. Takes the same arguments as requests.post
+    """
+    return request('POST', url, **kwargs)
@@ -0,0 +1,119 @@
+"""
+Helpers for running the network bound parts of the watchdogs concurrently
+"""
+import time
+import threading
+from multiprocessing.pool import ThreadPool
+
+DEFAULT_MAX_WORKERS = 8
+
+# How long to back off for when an API rate limits us without saying for how long
+DEFAULT_RETRY_AFTER = 60
+
+
+def parallel_map(func, items, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Calls func for every item using a bounded pool of worker threads
+    :param func:        callable    The function to call for each item
+    :param items:       iterable    The items to call func with
+    :param max_workers: int         The maximum number of concurrent calls
+    :returns:           list        The return values of func, in the same order
+                                    as items
+    """
+    items = list(items)
+    workers = min(max_workers, len(items))
+    if workers <= 1:
+        return [func(item) for item in items]
+
+    pool = ThreadPool(workers)
+    try:
+        return pool.map(func, items, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _parse_header(response, name, parse):
+    """
+    Returns a response header converted with parse, or None if it's missing or
+    doesn't parse
+    """
+    try:
+        return parse(response.headers[name])
+    except (KeyError, ValueError):
+        return None
+
+
+class RateLimitThrottle(object):
+    """
+    Bounds the number of requests in flight against an API, adapting to the
+    rate limit headers (X-RateLimit-Remaining, X-RateLimit-Reset and
+    Retry-After) of its responses so that running requests concurrently
+    doesn't lock the API token out:
+
+    - While plenty of requests remain up to max_concurrency requests run at once
+    - Once X-RateLimit-Remaining drops to low_watermark requests run one at a time
+    - When the limit is exhausted, or a Retry-After is sent, all requests pause
+      until the limit resets
+
+    Usage:
+
+        while True:
+            with throttle:
+                response = requests.get(uri)
+            if not throttle.update(response):
+                break
+    """
+
+    def __init__(self, max_concurrency=DEFAULT_MAX_WORKERS, low_watermark=100):
+        self.max_concurrency = max_concurrency
+        self.low_watermark = low_watermark
+        self._concurrency = max_concurrency
+        self._in_flight = 0
+        self._resume_at = 0
+        self._condition = threading.Condition()
+
+    def __enter__(self):
+        with self._condition:
+            while True:
+                wait = self._resume_at - time.time()
+                if wait <= 0 and self._in_flight < self._concurrency:
+                    break
+                self._condition.wait(wait if wait > 0 else None)
+            self._in_flight += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def update(self, response):
+        """
+        Adjusts the throttle to the rate limit headers of a response
+        :param response:    requests.Response   A response from the throttled API
+        :returns:           bool                True if the request was rejected
+                                                by the rate limit and should be
+                                                retried
+        """
+        now = time.time()
+        resume_at = 0
+        # Rate limit headers that don't parse are ignored
+        remaining = _parse_header(response, 'X-RateLimit-Remaining', int)
+
+        if 'Retry-After' in response.headers:
+            try:
+                resume_at = now + int(response.headers['Retry-After'])
+            except ValueError:
+                resume_at = now + DEFAULT_RETRY_AFTER
+        elif remaining == 0:
+            reset = _parse_header(response, 'X-RateLimit-Reset', float)
+            resume_at = reset if reset is not None else now + DEFAULT_RETRY_AFTER
+
+        with self._condition:
+            if remaining is not None:
+                self._concurrency = self.max_concurrency if remaining > self.low_watermark else 1
+            self._resume_at = max(self._resume_at, resume_at)
+            self._condition.notify_all()
+
+        return response.status_code in (403, 429) and resume_at > now
@@ -0,0 +1,181 @@
+"""
+Loads config.py (from the location in the WATCHDOG_CONFIG_LOCATION environment
+variable) once per process, however many test modules use it:
+
+    from watchdogs.config import load_config
+
+    CONFIG = load_config()
+
+Variables are accessed as attributes, exactly as if config.py had been
+imported directly (CONFIG.SLACK_AUTH_TOKEN).
+
+Expensive values in config.py (e.g. anything that queries a directory) can be
+wrapped with lazy so that they're only evaluated the first time a test uses
+them, and then only once. Lazy values are evaluated by calling them, which is
+how they can be used in the rest of config.py:
+
+    from watchdogs.config import lazy
+
+    @lazy
+    def LDAP_USERS():
+        return query_ldap()
+
+    SLACK_VALID_EMAILS = lazy(lambda: [user['mail'][0].lower() for user in LDAP_USERS()])
+
+The loaded config also provides derived views of its variables that are built
+once and cached, e.g. CONFIG.allowlist('SLACK_VALID_EMAILS') (See
+watchdogs/allowlist.py) and CONFIG.exception_policy('SLACK_EXCEPTIONS') (See
+watchdogs/policy.py). Other views are built with CONFIG.view, e.g.
+CONFIG.view('AWS_SECURITY_GROUP_IP_EXCEPTIONS', NetworkIndex). Tests should get
+views from the config when they use them, rather than keeping them in module
+level variables, so that they're rebuilt when the config is reset.
+
+Optional config.py variables:
+
+WATCHDOG_EMAIL_PLUS_ADDRESSING  Boolean     Whether allowlists ignore a "+tag" in
+                                            email addresses (Default False)
+
+WATCHDOG_EMAIL_DOMAIN_ALIASES   Dict        Email domains mapped to the domain they
+                                            are an alias of, for allowlists
+                                            e.g. {'example.co.uk': 'example.com'}
+"""
+import os
+import imp
+import threading
+
+from watchdogs.allowlist import AllowList
+from watchdogs.policy import ExceptionPolicy
+
+_CONFIG = None
+# The default of a view of a required variable
+_REQUIRED = object()
+_LOCK = threading.RLock()
+
+
+class Lazy(object):
+    """
+    A config value that is computed by calling a function the first time it's
+    needed, and then cached
+    """
+
+    def __init__(self, function):
+        self.function = function
+        self._lock = threading.Lock()
+        self._evaluated = False
+        self._value = None
+
+    def __call__(self):
+        with self._lock:
+            if not self._evaluated:
+                self._value = self.function()
+                self._evaluated = True
+        return self._value
+
+    def reset(self):
+        """
+        Forgets the cached value, so that it's computed again the next time
+        it's needed
+        """
+        with self._lock:
+            self._evaluated = False
+            self._value = None
+
+
+def lazy(function):
+    """
+    Marks a value in config.py to be computed by calling function the first
+    time it's used (Can be used as a decorator)
+    :param function:    callable    Takes no arguments and returns the value
+    :returns:           Lazy        The deferred value
+    """
+    return Lazy(function)
+
+
+class Config(object):
+    """
+    A loaded config.py. Attribute access returns the variables defined in it,
+    evaluating any lazy values.
+    """
+
+    def __init__(self, module):
+        self._module = module
+        self._views = {}
+        self._views_lock = threading.RLock()
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        value = getattr(self._module, name)
+        if isinstance(value, Lazy):
+            value = value()
+        return value
+
+    def reset(self):
+        """
+        Forgets every evaluated lazy value and derived view, so that they're
+        built again from fresh data the next time they're used (e.g. between
+        the runs of a long running process, see watchdogs/daemon.py)
+        """
+        with self._views_lock:
+            for value in vars(self._module).values():
+                if isinstance(value, Lazy):
+                    value.reset()
+            self._views.clear()
+
+    def _view(self, kind, name, build, default=_REQUIRED):
+        with self._views_lock:
+            if (kind, name) not in self._views:
+                value = getattr(self, name) if default is _REQUIRED else getattr(self, name, default)
+                self._views[(kind, name)] = build(value)
+            return self._views[(kind, name)]
+
+    def view(self, name, build, default=_REQUIRED):
+        """
+        Returns a variable converted by build, built the first time it's
+        requested
+        :param name:    str         The name of the variable, e.g. 'GITHUB_ALLOWED_HOOKS'
+        :param build:   callable    Takes the value of the variable and returns the view
+        :param default:             The value to build the view from if the
+                                    variable isn't set. By default the
+                                    variable is required
+        :returns:                   The view
+        """
+        return self._view(('view', build), name, build, default)
+
+    def allowlist(self, name, case_sensitive=False):
+        """
+        Returns a variable (a list, or a dictionary keyed by the allowed values)
+        as an AllowList, built the first time it's requested
+        :param name:            str         The name of the variable, e.g. 'SLACK_VALID_EMAILS'
+        :param case_sensitive:  bool        Whether case matters
+        :returns:               AllowList   The normalized values
+        """
+        return self._view(('allowlist', case_sensitive), name, lambda values: AllowList(
+            values,
+            case_sensitive=case_sensitive,
+            plus_addressing=getattr(self, 'WATCHDOG_EMAIL_PLUS_ADDRESSING', False),
+            domain_aliases=getattr(self, 'WATCHDOG_EMAIL_DOMAIN_ALIASES', None)))
+
+    def exception_policy(self, name, literal=False):
+        """
+        Returns a dictionary of exceptions as an ExceptionPolicy, built the first
+        time it's requested
+        :param name:    str             The name of the variable, e.g. 'SLACK_EXCEPTIONS'
+        :param literal: bool            If True keys are matched exactly, otherwise
+                                        they are regular expressions
+        :returns:       ExceptionPolicy The compiled exceptions
+        """
+        return self._view(('exception_policy', literal), name,
+                          lambda exceptions: ExceptionPolicy(exceptions, literal=literal))
+
+def load_config():
+    """
+    Returns the config loaded from WATCHDOG_CONFIG_LOCATION, loading it the first
+    time this is called in the process
+    :returns:   Config  The loaded config
+    """
+    global _CONFIG
+    with _LOCK:
+        if _CONFIG is None:
+            _CONFIG = Config(imp.load_source('config', os.environ['WATCHDOG_CONFIG_LOCATION']))
+        return _CONFIG
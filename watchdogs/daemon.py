@@ -0,0 +1,222 @@
+"""
+Runs the enabled tests continuously in one long running process, each test
+module on its own schedule, instead of starting py.test from scratch for every
+run:
+
+    python -m watchdogs.daemon enabled_tests/
+
+The test modules, config.py and watchdogs.client's connection pools stay
+loaded between runs, so a run only pays for fetching the data it checks. Before
+each run the inventories of the modules being run, the lazy values and views of
+config.py and the github repository listing are reset, and the reset() function
+of each module being run is called if it has one. Test modules should therefore
+get views of config.py (allowlists, network indexes...) from the config when
+they use them rather than keeping them in module level variables, and clear
+anything else they cache (e.g. logins) in reset().
+
+Modules that are due at the same time are run together in a single py.test
+session, so their inventories are still fetched concurrently. The results of
+the latest run of every module are written to a JSON file and/or posted to an
+HTTP endpoint as JSON, e.g.
+
+    {"test_slack_users": {"started_at": 1500000000.0,
+                          "finished_at": 1500000012.5,
+                          "passed": 120, "failed": 1, "skipped": 0, "errors": 0,
+                          "failures": [{"test": "enabled_tests/test_slack_users.py::test_two_factor[60]",
+                                        "message": "AssertionError: ..."}]}}
+
+The message of a failure is only the first line of its exception, never the
+full traceback or the test's parameters, which may include credentials.
+
+Optional config.py variables:
+
+WATCHDOG_SCHEDULES          Dict        Test module names mapped to the number of
+                                        seconds between their runs, e.g.
+                                        {'test_aws_iam_users': 3600,
+                                         'test_slack_users': 300}
+
+WATCHDOG_DEFAULT_SCHEDULE   Integer     The number of seconds between runs of
+                                        modules that aren't in
+                                        WATCHDOG_SCHEDULES (Default 3600)
+
+WATCHDOG_RESULTS_FILE       String      The JSON file to write the results to
+
+WATCHDOG_RESULTS_URL        String      A URL to POST the results of each run to
+"""
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import argparse
+import tempfile
+
+import pytest
+import requests
+
+from watchdogs import client, github, inventory
+from watchdogs.config import load_config
+
+DEFAULT_SCHEDULE = 60 * 60
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ResultCollector(object):
+    """
+    A py.test plugin that counts the outcomes of each test module in a run
+    """
+
+    def __init__(self, modules, started_at):
+        self.results = {}
+        for module in modules:
+            self.results[module] = {'started_at': started_at, 'finished_at': None,
+                                    'passed': 0, 'failed': 0, 'skipped': 0, 'errors': 0,
+                                    'failures': []}
+
+    def _result(self, nodeid):
+        return self.results.get(module_name(nodeid.split('::')[0]))
+
+    def pytest_collectreport(self, report):
+        result = self._result(report.nodeid)
+        if result is not None and report.failed:
+            result['errors'] += 1
+            result['failures'].append({'test': report.nodeid, 'message': failure_message(report)})
+
+    def pytest_runtest_logreport(self, report):
+        result = self._result(report.nodeid)
+        if result is None:
+            return
+        if report.failed:
+            # Failures in setup or teardown are errors rather than test failures
+            result['failed' if report.when == 'call' else 'errors'] += 1
+            result['failures'].append({'test': report.nodeid, 'message': failure_message(report)})
+        elif report.skipped:
+            result['skipped'] += 1
+        elif report.when == 'call':
+            result['passed'] += 1
+
+
+def failure_message(report):
+    """
+    Returns the first line of the exception that failed a test, e.g.
+    "AssertionError: User without 2FA: [alice]", without the traceback or the
+    test's parameters, which may include credentials
+    """
+    crash = getattr(report.longrepr, 'reprcrash', None)
+    if crash is not None:
+        message = crash.message
+    else:
+        # e.g. collection errors, whose last line is the exception
+        lines = [line for line in str(report.longrepr).splitlines() if line.strip()]
+        message = lines[-1].lstrip('E').strip() if lines else ''
+    return message.splitlines()[0] if message else 'Failed'
+
+
+def module_name(path):
+    """
+    Returns the name of the test module at a path, e.g. 'test_slack_users'
+    """
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def find_modules(directory):
+    """
+    Returns the test modules in a directory, mapped to their paths
+    """
+    return dict((module_name(path), path) for path in glob.glob(os.path.join(directory, 'test_*.py')))
+
+
+def reset(modules):
+    """
+    Resets everything cached by a previous run of some test modules
+    """
+    inventory.reset(modules)
+    github.reset()
+    load_config().reset()
+    for module in modules:
+        reset_module = getattr(sys.modules.get(module), 'reset', None)
+        if reset_module is not None:
+            reset_module()
+
+
+def run(modules, paths):
+    """
+    Runs test modules in one py.test session
+    :param modules: list[str]   The names of the modules
+    :param paths:   dict        Module names mapped to their paths
+    :returns:       dict        Module names mapped to their results
+    """
+    reset(modules)
+    collector = ResultCollector(modules, time.time())
+    pytest.main([paths[module] for module in modules], plugins=[collector])
+    finished_at = time.time()
+    for result in collector.results.values():
+        result['finished_at'] = finished_at
+    return collector.results
+
+
+def publish(results, all_results, results_file=None, results_url=None):
+    """
+    Writes the latest results of every module to results_file, and posts the
+    results of the last run to results_url
+    :param results:         dict    The results of the last run
+    :param all_results:     dict    The latest results of every module
+    """
+    if results_file:
+        handle, temporary_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(results_file)))
+        with os.fdopen(handle, 'w') as output:
+            json.dump(all_results, output, indent=2, sort_keys=True)
+        os.rename(temporary_path, results_file)
+
+    if results_url:
+        try:
+            client.post(results_url, json=results).raise_for_status()
+        except requests.RequestException as error:
+            # Publishing is retried with the next run's results
+            LOGGER.error('Failed to post results to %s: %s', results_url, error)
+
+
+def run_forever(directory):
+    """
+    Runs the test modules in a directory on their schedules, forever
+    :param directory:   str     The directory of enabled tests
+    """
+    watchdog_config = load_config()
+    schedules = getattr(watchdog_config, 'WATCHDOG_SCHEDULES', {})
+    default_schedule = getattr(watchdog_config, 'WATCHDOG_DEFAULT_SCHEDULE', DEFAULT_SCHEDULE)
+    results_file = getattr(watchdog_config, 'WATCHDOG_RESULTS_FILE', None)
+    results_url = getattr(watchdog_config, 'WATCHDOG_RESULTS_URL', None)
+
+    paths = find_modules(directory)
+    if not paths:
+        raise ValueError('No test modules found in {0}'.format(directory))
+    next_runs = dict((module, 0) for module in paths)
+    all_results = {}
+
+    while True:
+        now = time.time()
+        due = sorted(module for module, next_run in next_runs.items() if next_run <= now)
+        if due:
+            LOGGER.info('Running %s', ', '.join(due))
+            results = run(due, paths)
+            all_results.update(results)
+            publish(results, all_results, results_file, results_url)
+            for module in due:
+                next_runs[module] = now + schedules.get(module, default_schedule)
+        time.sleep(max(0, min(next_runs.values()) - time.time()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs watchdogs tests continuously on a schedule')
+    parser.add_argument('directory', nargs='?', default='enabled_tests',
+                        help='The directory of tests to run (Default enabled_tests)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    run_forever(args.directory)
+
+
+if __name__ == '__main__':
+    main()
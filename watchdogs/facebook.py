@@ -0,0 +1,140 @@
+"""
+Facebook Graph API helpers.
+
+- App access tokens are cached until they expire, rather than requested for
+  every use. They're cached in memory, and also on disk between runs if a
+  directory is configured with configure_token_cache (conftest.py uses
+  WATCHDOG_HTTP_CACHE_DIR)
+- Users (or any other objects) are looked up in batches of up to 50 IDs per
+  request using the ?ids= parameter, rather than one request per ID
+"""
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+from watchdogs import client
+from watchdogs.concurrency import parallel_map, DEFAULT_MAX_WORKERS
+
+GRAPH_URL = 'https://graph.facebook.com'
+API_VERSION = 'v2.4'
+
+# The maximum number of IDs the Graph API accepts in one request
+MAX_IDS_PER_REQUEST = 50
+
+# How long to cache an app access token for if Facebook doesn't say when it
+# expires (App access tokens are normally valid until the app secret changes)
+DEFAULT_TOKEN_TTL = 24 * 60 * 60
+
+# The file app access tokens are stored in, in the token cache directory
+TOKEN_CACHE_FILE = 'facebook-app-tokens.json'
+
+_APP_TOKENS = {}
+_LOCK = threading.Lock()
+_TOKEN_CACHE_PATH = None
+
+
+def configure_token_cache(directory):
+    """
+    Stores app access tokens in a directory between runs, or stops storing them
+    :param directory:   str     The directory to store tokens in, or None
+    """
+    global _TOKEN_CACHE_PATH
+    _TOKEN_CACHE_PATH = os.path.join(directory, TOKEN_CACHE_FILE) if directory else None
+
+
+def _load_tokens():
+    try:
+        with open(_TOKEN_CACHE_PATH) as token_file:
+            return json.load(token_file)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def _store_tokens(tokens):
+    """
+    Replaces the stored tokens atomically, readable only by the current user
+    """
+    directory = os.path.dirname(_TOKEN_CACHE_PATH)
+    if not os.path.isdir(directory):
+        os.makedirs(directory, 0o700)
+    handle, temporary_path = tempfile.mkstemp(dir=directory)
+    os.chmod(temporary_path, 0o600)
+    with os.fdopen(handle, 'w') as token_file:
+        json.dump(tokens, token_file)
+    os.rename(temporary_path, _TOKEN_CACHE_PATH)
+
+
+def _parse_token(response):
+    """
+    Returns (access_token, expires_in) from an oauth/access_token response,
+    which is JSON in newer API versions and form encoded in older ones
+    """
+    try:
+        body = response.json()
+    except ValueError:
+        body = dict(field.split('=', 1) for field in response.text.split('&') if '=' in field)
+    expires_in = body.get('expires_in', body.get('expires'))
+    return body['access_token'], int(expires_in) if expires_in else None
+
+
+def app_access_token(app_id, app_secret):
+    """
+    Returns an access token for an app, requesting one if there isn't a cached
+    token that's still valid
+    See https://developers.facebook.com/docs/facebook-login/access-tokens#apptokens
+    :param app_id:      str     The ID of the app
+    :param app_secret:  str     The app's secret
+    :returns:           str     The access token
+    """
+    # The secret isn't stored, only used to tell tokens of different secrets apart
+    key = hashlib.sha256('{0}:{1}'.format(app_id, app_secret).encode('utf-8')).hexdigest()
+    with _LOCK:
+        cached = _APP_TOKENS.get(key)
+        if cached is None and _TOKEN_CACHE_PATH:
+            cached = _load_tokens().get(key)
+    if cached is not None and cached[1] > time.time():
+        return cached[0]
+
+    response = client.get('{0}/oauth/access_token'.format(GRAPH_URL),
+                          params={'client_id': app_id, 'client_secret': app_secret,
+                                  'grant_type': 'client_credentials'})
+    response.raise_for_status()
+    access_token, expires_in = _parse_token(response)
+    with _LOCK:
+        _APP_TOKENS[key] = (access_token, time.time() + (expires_in or DEFAULT_TOKEN_TTL))
+        if _TOKEN_CACHE_PATH:
+            tokens = dict((stored_key, token) for stored_key, token in _load_tokens().items()
+                          if token[1] > time.time())
+            tokens[key] = _APP_TOKENS[key]
+            _store_tokens(tokens)
+    return access_token
+
+
+def get_objects(ids, access_token, fields=None, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Looks up objects (e.g. users) by ID, MAX_IDS_PER_REQUEST at a time, with
+    the batches requested concurrently
+    :param ids:         list[str]   The IDs
+    :param access_token:str         An access token that can read the objects
+    :param fields:      list[str]   The fields to return, or None for the default fields
+    :param max_workers: int         The maximum number of batches to request at once
+    :returns:           dict        IDs mapped to the objects' fields
+    """
+    ids = list(ids)
+    batches = [ids[start:start + MAX_IDS_PER_REQUEST] for start in range(0, len(ids), MAX_IDS_PER_REQUEST)]
+
+    def get_batch(batch):
+        params = {'ids': ','.join(batch), 'access_token': access_token}
+        if fields:
+            params['fields'] = ','.join(fields)
+        response = client.get('{0}/{1}/'.format(GRAPH_URL, API_VERSION), params=params)
+        response.raise_for_status()
+        return response.json()
+
+    objects = {}
+    for batch_objects in parallel_map(get_batch, batches, max_workers):
+        objects.update(batch_objects)
+    return objects
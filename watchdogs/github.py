@@ -0,0 +1,332 @@
+"""
+Fetching organisation members and repositories from github, with either the
+REST API (one request per 100 members or repositories, and another set of
+requests for the members without two factor authentication) or, optionally,
+the GraphQL API (one request per 100 members including their two factor
+authentication status, and one per 100 repositories).
+
+Both return the same data, so tests don't need to know which API is used:
+
+    from watchdogs import github
+
+    for login, two_factor_enabled in github.members(organisation, token, use_graphql=True):
+        ...
+
+The repositories of each organisation are only listed once per session, however
+many tests use them, and are the starting point for checks of each repository
+(hooks, deploy keys, collaborators...):
+
+    repos = github.all_repositories(organisations, token)
+    hooks = github.map_repositories(get_hooks_for_repo, repos)
+
+Checks of each repository can also be made incremental with a
+RepositoryScanState, which saves their results between runs and only checks
+the repositories that have changed since, or revalidates the saved results
+with conditional requests.
+
+All requests are made with watchdogs.client, sharing its pooled session for
+api.github.com.
+"""
+import os
+import json
+import time
+import tempfile
+import threading
+from collections import namedtuple
+
+from watchdogs import client, pagination
+from watchdogs.inventory import Inventory
+from watchdogs.concurrency import parallel_map, DEFAULT_MAX_WORKERS
+
+API_URL = 'https://api.github.com'
+GRAPHQL_URL = API_URL + '/graphql'
+
+# The maximum number of items github returns per page
+PAGE_SIZE = 100
+
+MEMBERS_QUERY = '''
+query($organisation: String!, $pageSize: Int!, $cursor: String) {
+  organization(login: $organisation) {
+    membersWithRole(first: $pageSize, after: $cursor) {
+      pageInfo { hasNextPage endCursor }
+      edges { hasTwoFactorEnabled node { login } }
+    }
+  }
+}
+'''
+
+REPOSITORIES_QUERY = '''
+query($organisation: String!, $pageSize: Int!, $cursor: String) {
+  organization(login: $organisation) {
+    repositories(first: $pageSize, after: $cursor) {
+      pageInfo { hasNextPage endCursor }
+      nodes { name isPrivate visibility pushedAt updatedAt }
+    }
+  }
+}
+'''
+
+
+Repository = namedtuple('Repository', ['organisation', 'name', 'private', 'visibility', 'pushed_at', 'updated_at'])
+
+_REPOSITORIES = {}
+_LOCK = threading.Lock()
+
+
+class GraphQLError(Exception):
+    """
+    Raised when a GraphQL query returns errors
+    """
+    pass
+
+
+def rest_auth(token):
+    """
+    Returns the auth argument for REST API requests made with a token
+    """
+    return (token, 'x-oauth-basic')
+
+
+def graphql(query, variables, token):
+    """
+    Runs a GraphQL query (which only reads data, so is retried like a GET)
+    :param query:       str     The query
+    :param variables:   dict    The values of the query's variables
+    :param token:       str     A github API token
+    :returns:           dict    The data returned by the query
+    """
+    response = client.post(GRAPHQL_URL, json={'query': query, 'variables': variables},
+                           headers={'Authorization': 'bearer {0}'.format(token)}, retry=True)
+    response.raise_for_status()
+    body = response.json()
+    if body.get('errors'):
+        raise GraphQLError('; '.join(error.get('message', str(error)) for error in body['errors']))
+    return body['data']
+
+
+def _graphql_pages(query, variables, token, path, items_key):
+    """
+    Yields every item of a paginated GraphQL connection
+    :param path:        tuple   The keys of the connection in the data, e.g.
+                                ('organization', 'repositories')
+    :param items_key:   str     'nodes' or 'edges'
+    """
+    variables = dict(variables, pageSize=PAGE_SIZE, cursor=None)
+    while True:
+        connection = graphql(query, variables, token)
+        for key in path:
+            connection = connection[key]
+        for item in connection[items_key]:
+            yield item
+        if not connection['pageInfo']['hasNextPage']:
+            return
+        variables['cursor'] = connection['pageInfo']['endCursor']
+
+
+def members(organisation, token, use_graphql=False):
+    """
+    Yields (login, two_factor_enabled) for each member of an organisation.
+    Finding out whether members have two factor authentication enabled
+    requires the token to belong to an owner of the organisation.
+    :param organisation:    str     The github organisation
+    :param token:           str     A github API token
+    :param use_graphql:     bool    Whether to use the GraphQL API
+    """
+    if use_graphql:
+        for edge in _graphql_pages(MEMBERS_QUERY, {'organisation': organisation}, token,
+                                   ('organization', 'membersWithRole'), 'edges'):
+            yield edge['node']['login'], edge['hasTwoFactorEnabled']
+        return
+
+    uri = '{0}/orgs/{1}/members'.format(API_URL, organisation)
+    two_factor_disabled = set(member['login'] for member in pagination.link_header(
+        uri, params={'per_page': PAGE_SIZE, 'filter': '2fa_disabled'}, auth=rest_auth(token)))
+    for member in pagination.link_header(uri, params={'per_page': PAGE_SIZE}, auth=rest_auth(token)):
+        yield member['login'], member['login'] not in two_factor_disabled
+
+
+def repositories(organisation, token, use_graphql=False):
+    """
+    Yields a Repository for each repository of an organisation, listing them
+    from github every time it's called (See organisation_repositories)
+    :param organisation:    str     The github organisation
+    :param token:           str     A github API token
+    :param use_graphql:     bool    Whether to use the GraphQL API
+    """
+    if use_graphql:
+        for node in _graphql_pages(REPOSITORIES_QUERY, {'organisation': organisation}, token,
+                                   ('organization', 'repositories'), 'nodes'):
+            yield Repository(organisation, node['name'], node['isPrivate'], node['visibility'].lower(),
+                             node['pushedAt'], node['updatedAt'])
+        return
+
+    # See https://developer.github.com/v3/repos/#list-organization-repositories
+    uri = '{0}/orgs/{1}/repos'.format(API_URL, organisation)
+    for repo in pagination.link_header(uri, params={'per_page': PAGE_SIZE}, auth=rest_auth(token)):
+        visibility = repo.get('visibility', 'private' if repo['private'] else 'public')
+        yield Repository(organisation, repo['name'], repo['private'], visibility,
+                         repo['pushed_at'], repo['updated_at'])
+
+
+def organisation_repositories(organisation, token, use_graphql=False):
+    """
+    Returns the repositories of an organisation, listing them the first time
+    they're requested in the session
+    :param organisation:    str                 The github organisation
+    :param token:           str                 A github API token
+    :param use_graphql:     bool                Whether to use the GraphQL API
+    :returns:               list[Repository]    The repositories
+    """
+    key = (organisation, token, use_graphql)
+    with _LOCK:
+        if key not in _REPOSITORIES:
+            _REPOSITORIES[key] = Inventory(lambda: list(repositories(organisation, token, use_graphql)),
+                                           'github repositories of {0}'.format(organisation))
+    return _REPOSITORIES[key].result()
+
+
+def reset():
+    """
+    Forgets the repositories listed so far, so that they're listed again (e.g.
+    between the runs of a long running process, see watchdogs/daemon.py)
+    """
+    with _LOCK:
+        _REPOSITORIES.clear()
+
+
+def all_repositories(organisations, token, use_graphql=False):
+    """
+    Returns the repositories of several organisations, listing the
+    organisations concurrently
+    :param organisations:   list[str]           The github organisations
+    :param token:           str                 A github API token
+    :param use_graphql:     bool                Whether to use the GraphQL API
+    :returns:               list[Repository]    The repositories
+    """
+    all_repos = []
+    for repos in parallel_map(lambda organisation: organisation_repositories(organisation, token, use_graphql),
+                              organisations, len(organisations)):
+        all_repos += repos
+    return all_repos
+
+
+def map_repositories(func, repos, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Calls a function for each repository concurrently, e.g. to fetch its hooks
+    :param func:        callable            Takes a Repository
+    :param repos:       list[Repository]    The repositories
+    :param max_workers: int                 The maximum number of repositories
+                                            to call func for at once
+    :returns:           list                The return values, in the order of repos
+    """
+    return parallel_map(func, repos, max_workers)
+
+
+class RepositoryScanState(object):
+    """
+    The results of checking each repository (e.g. listing its hooks), saved in
+    a JSON file between runs. A saved result is current if the repository's
+    pushed_at and updated_at times haven't changed and it was fetched less than
+    full_rescan_seconds ago.
+
+    Not every change to a repository (e.g. adding a hook) changes those times,
+    so by default a repository with a current result isn't checked at all, and
+    the full rescan interval is how long such a change can go unnoticed. With
+    revalidate=True every repository is checked on every scan, but those with a
+    current result are checked with their saved entry, so that the check can
+    be a conditional request (e.g. If-None-Match with the saved etag), which
+    github doesn't count against the rate limit when nothing has changed.
+    """
+
+    def __init__(self, path, full_rescan_seconds):
+        """
+        :param path:                str     The JSON file to save results in
+        :param full_rescan_seconds: int     The maximum age of a saved result
+        """
+        self.path = path
+        self.full_rescan_seconds = full_rescan_seconds
+        self._entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as state_file:
+                return json.load(state_file)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _save(self):
+        handle, temporary_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)))
+        with os.fdopen(handle, 'w') as state_file:
+            json.dump(self._entries, state_file)
+        os.rename(temporary_path, self.path)
+
+    @staticmethod
+    def key(repo):
+        return '{0}/{1}'.format(repo.organisation, repo.name)
+
+    def is_current(self, repo, now=None):
+        """
+        Returns True if the saved result for a repository can be used without
+        checking it again
+        """
+        entry = self._entries.get(self.key(repo))
+        if entry is None:
+            return False
+        now = time.time() if now is None else now
+        return (entry['pushed_at'] == repo.pushed_at and entry['updated_at'] == repo.updated_at and
+                now - entry['scanned_at'] < self.full_rescan_seconds)
+
+    def scan(self, repos, scan, is_complete=lambda result: True, max_workers=DEFAULT_MAX_WORKERS,
+             revalidate=False):
+        """
+        Returns the result of checking each repository, checking (concurrently)
+        only the repositories without a current saved result, or every
+        repository if revalidate is True, then saves the results. Repositories
+        that aren't in repos are forgotten.
+        :param repos:       list[Repository]    The repositories
+        :param scan:        callable            Takes a Repository and its saved
+                                                entry (or None), which includes
+                                                the result and etag of the last
+                                                check, and returns (result, etag)
+        :param is_complete: callable            Returns False for results that
+                                                shouldn't be saved (e.g. errors)
+        :param max_workers: int                 The maximum number of
+                                                repositories to check at once
+        :param revalidate:  bool                If True repositories with a
+                                                current result are checked too,
+                                                with their saved entry. Others
+                                                are checked without one
+        :returns:           list                The results, in the order of repos
+        """
+        now = time.time()
+        current = set(self.key(repo) for repo in repos if self.is_current(repo, now))
+        if revalidate:
+            check = list(repos)
+            previous = lambda key: self._entries[key] if key in current else None
+        else:
+            check = [repo for repo in repos if self.key(repo) not in current]
+            previous = self._entries.get
+        scanned = dict(zip([self.key(repo) for repo in check],
+                           parallel_map(lambda repo: scan(repo, previous(self.key(repo))), check, max_workers)))
+
+        entries = {}
+        results = []
+        for repo in repos:
+            key = self.key(repo)
+            if key in scanned:
+                result, etag = scanned[key]
+                if is_complete(result):
+                    scanned_at = now
+                    if key in current and etag and etag == self._entries[key].get('etag'):
+                        # Revalidated rather than fetched again
+                        scanned_at = self._entries[key]['scanned_at']
+                    entries[key] = {'pushed_at': repo.pushed_at, 'updated_at': repo.updated_at,
+                                    'scanned_at': scanned_at, 'etag': etag, 'result': result}
+            else:
+                entries[key] = self._entries[key]
+                result = entries[key]['result']
+            results.append(result)
+
+        self._entries = entries
+        self._save()
+        return results
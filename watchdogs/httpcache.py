@@ -0,0 +1,244 @@
+"""
+On disk cache of HTTP GET responses for watchdogs.client, so that responses
+that haven't changed since the last run don't need to be downloaded again.
+
+Responses are stored with their ETag/Last-Modified headers. Once a response
+is older than the TTL for its host, the request is sent again with
+If-None-Match/If-Modified-Since headers, and if the server responds with
+304 Not Modified the stored response is used. Within the TTL the stored
+response is used without making a request at all. With the default TTL of 0
+every request is revalidated, so only responses with an ETag or
+Last-Modified header are worth storing.
+
+Github doesn't count 304 responses against the API rate limit.
+
+Responses are keyed by a hash of their URL (including the query string) and
+the credentials they were requested with, so that different credentials never
+share responses. Only successful (200) responses are stored.
+
+Credentials are never written to the cache: credential query parameters (e.g.
+Slack's token or Facebook's access_token) are removed from the stored URL,
+Set-Cookie headers aren't stored, and requests to OAuth/token endpoints or
+with a client secret or password aren't cached at all. The cache directories
+are only accessible by the user running the tests, and entries that haven't
+been used for max_age seconds are pruned (See HTTPCache.prune).
+"""
+import os
+import re
+import json
+import time
+import base64
+import hashlib
+import tempfile
+import threading
+
+import requests
+from requests.utils import get_encoding_from_headers
+from requests.structures import CaseInsensitiveDict
+
+try:
+    from urllib.parse import urlparse, urlsplit, urlunsplit, parse_qsl, urlencode
+except ImportError:
+    from urlparse import urlparse, urlsplit, urlunsplit, parse_qsl
+    from urllib import urlencode
+
+# Headers that aren't stored: those that describe the encoded body sent over
+# the wire, which don't apply to the decoded body that's stored, and cookies
+_UNSTORED_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding', 'set-cookie')
+
+# Query parameters holding credentials, which are removed from stored URLs
+CREDENTIAL_PARAMS = frozenset(['token', 'access_token', 'client_secret', 'password', 'api_key', 'apikey',
+                               'key', 'secret'])
+
+# Query parameters of requests that are never cached, as they exchange secrets
+# for credentials
+_UNCACHEABLE_PARAMS = frozenset(['client_secret', 'password'])
+
+# Paths of OAuth and token endpoints, which are never cached
+_UNCACHEABLE_PATH = re.compile(r'oauth|token', re.IGNORECASE)
+
+# How long an entry is kept for after it was last stored or revalidated
+DEFAULT_MAX_AGE = 7 * 24 * 60 * 60
+
+
+def is_cacheable(url, params=None):
+    """
+    Returns False for requests that exchange secrets for credentials, whose
+    responses mustn't be stored
+    :param url:     str     The URL of the request
+    :param params:  dict    The query parameters of the request, if not in url
+    """
+    scheme, netloc, path, query, fragment = urlsplit(url)
+    names = set(name.lower() for name, _ in parse_qsl(query))
+    names.update(name.lower() for name in (params or {}))
+    return not (_UNCACHEABLE_PATH.search(path) or names & _UNCACHEABLE_PARAMS)
+
+
+def redact(url):
+    """
+    Returns url without any credential query parameters
+    """
+    scheme, netloc, path, query, fragment = urlsplit(url)
+    query = [(name, value) for name, value in parse_qsl(query, keep_blank_values=True)
+             if name.lower() not in CREDENTIAL_PARAMS]
+    return urlunsplit((scheme, netloc, path, urlencode(query), fragment))
+
+
+class HTTPCache(object):
+    """
+    A directory of cached responses
+    """
+
+    def __init__(self, directory, ttls=None, default_ttl=0, max_age=DEFAULT_MAX_AGE):
+        """
+        :param directory:   str     The directory to store responses in
+        :param ttls:        dict    Host names mapped to the number of seconds
+                                    their responses are used for without
+                                    revalidating them
+        :param default_ttl: int     The TTL of hosts that aren't in ttls
+        :param max_age:     int     The number of seconds entries are kept for
+                                    after they were last stored or revalidated
+        """
+        self.directory = directory
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+    def ttl(self, url):
+        return self.ttls.get(urlparse(url).netloc, self.default_ttl)
+
+    @staticmethod
+    def key(method, url, **kwargs):
+        """
+        Returns the key of a request: a hash of its URL and credentials
+        :param kwargs:  The arguments of the request, as for requests.request
+        """
+        prepared = requests.Request(method, url, params=kwargs.get('params'), headers=kwargs.get('headers'),
+                                    auth=kwargs.get('auth'), cookies=kwargs.get('cookies')).prepare()
+        identity = '\n'.join([method, prepared.url, prepared.headers.get('Authorization', ''),
+                              prepared.headers.get('Cookie', '')])
+        return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    def load(self, key):
+        """
+        Returns the stored entry for a key, or None
+        """
+        try:
+            with open(self._path(key)) as entry_file:
+                return json.load(entry_file)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def store(self, key, entry):
+        """
+        Stores an entry, replacing the file atomically so that concurrent
+        readers never see a partly written entry
+        """
+        path = self._path(key)
+        with self._lock:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory, 0o700)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.mkdir(os.path.dirname(path), 0o700)
+        handle, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(handle, 'w') as entry_file:
+            json.dump(entry, entry_file)
+        os.rename(temporary_path, path)
+
+    def prune(self, now=None):
+        """
+        Deletes the entries that haven't been stored or revalidated for
+        max_age seconds, e.g. those of deleted repositories or users
+        :returns:   int     The number of entries deleted
+        """
+        cutoff = (time.time() if now is None else now) - self.max_age
+        pruned = 0
+        try:
+            subdirectories = os.listdir(self.directory)
+        except OSError:
+            return 0
+        for subdirectory in subdirectories:
+            subdirectory = os.path.join(self.directory, subdirectory)
+            if len(os.path.basename(subdirectory)) != 2 or not os.path.isdir(subdirectory):
+                continue
+            for name in os.listdir(subdirectory):
+                path = os.path.join(subdirectory, name)
+                try:
+                    if name.endswith('.json') and os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        pruned += 1
+                except OSError:
+                    # Replaced or removed by another process
+                    pass
+        return pruned
+
+    def is_fresh(self, entry, url):
+        """
+        Returns True if an entry can be used without revalidating it
+        """
+        return time.time() - entry['stored_at'] < self.ttl(url)
+
+    @staticmethod
+    def conditional_headers(entry, headers=None):
+        """
+        Returns a copy of headers with the headers to revalidate an entry added
+        """
+        headers = dict(headers or {})
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def update(self, key, entry, response):
+        """
+        Handles the response to a (possibly conditional) request: a 304 is
+        replaced with the stored response, and a cacheable 200 is stored
+        :param entry:       dict                The stored entry, if any
+        :param response:    requests.Response   The response to the request
+        :returns:           requests.Response   The response to use
+        """
+        if response.status_code == 304 and entry is not None:
+            entry['stored_at'] = time.time()
+            entry['etag'] = response.headers.get('ETag', entry.get('etag'))
+            self.store(key, entry)
+            return to_response(entry)
+
+        validators = response.headers.get('ETag') or response.headers.get('Last-Modified')
+        if response.status_code == 200 and (validators or self.ttl(response.url) > 0):
+            self.store(key, to_entry(response))
+        return response
+
+
+def to_entry(response):
+    """
+    Converts a response to a JSON serialisable entry
+    """
+    return {'url': redact(response.url),
+            'status_code': response.status_code,
+            'reason': response.reason,
+            'headers': dict((name, value) for name, value in response.headers.items()
+                            if name.lower() not in _UNSTORED_HEADERS),
+            'content': base64.b64encode(response.content).decode('ascii'),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'stored_at': time.time()}
+
+
+def to_response(entry):
+    """
+    Converts a stored entry back in to a response
+    """
+    response = requests.Response()
+    response.url = entry['url']
+    response.status_code = entry['status_code']
+    response.reason = entry['reason']
+    response.headers = CaseInsensitiveDict(entry['headers'])
+    response.encoding = get_encoding_from_headers(response.headers)
+    response._content = base64.b64decode(entry['content'])
+    response.from_cache = True
+    return response
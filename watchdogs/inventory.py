@@ -0,0 +1,143 @@
+"""
+Session wide registry of the inventories (users, repositories, security
+groups...) that tests are parametrized with.
+
+Fetching an inventory usually means calling a third party API, and py.test
+collects (imports and parametrizes) test modules one after another, so a run
+pays the sum of all the API latencies before the first test runs. Instead
+tests register the function that fetches their inventory and parametrize with
+the returned Inventory, which is only fetched when py.test first iterates it:
+
+    from watchdogs import inventory
+
+    @pytest.mark.parametrize("email", inventory.register(_all_pagerduty_users))
+    def test_unknown_pagerduty_user(email):
+        ...
+
+Before any module is collected conftest.py imports every test module (which
+registers all their inventories) and calls prefetch_all, which fetches them
+all concurrently, so collection takes as long as the slowest API.
+
+A long running process that runs the tests more than once (See
+watchdogs/daemon.py) calls reset before each run so that the inventories of
+the modules being run are fetched again.
+"""
+import threading
+
+from watchdogs.concurrency import parallel_map
+
+_REGISTRY = []
+_REGISTRY_LOCK = threading.Lock()
+
+
+class Inventory(object):
+    """
+    The lazily fetched return value of an inventory function. Iterating,
+    indexing or testing membership of an Inventory fetches it the first time,
+    after which the result is cached for the rest of the session. If fetching
+    raised an exception it's raised again each time the inventory is used.
+    """
+
+    def __init__(self, fetch, name=None):
+        self.fetch = fetch
+        self.name = name or fetch.__name__
+        self.module = getattr(fetch, '__module__', None)
+        self._lock = threading.Lock()
+        self._fetched = False
+        self._result = None
+        self._error = None
+
+    def __repr__(self):
+        return '<Inventory {0}>'.format(self.name)
+
+    @property
+    def fetched(self):
+        return self._fetched
+
+    def prefetch(self):
+        """
+        Fetches the inventory if it hasn't been already. Any exception raised
+        is kept to be raised when the inventory is used, so that it's reported
+        against the test module that uses it.
+        """
+        with self._lock:
+            if self._fetched:
+                return
+            try:
+                result = self.fetch()
+                # Generators can only be iterated once
+                if iter(result) is result:
+                    result = list(result)
+                self._result = result
+            except Exception as error:
+                self._error = error
+            self._fetched = True
+
+    def reset(self):
+        """
+        Forgets the fetched inventory, so that it's fetched again the next time
+        it's used
+        """
+        with self._lock:
+            self._fetched = False
+            self._result = None
+            self._error = None
+
+    def result(self):
+        """
+        Returns the inventory, fetching it if necessary
+        """
+        self.prefetch()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def __iter__(self):
+        return iter(self.result())
+
+    def __len__(self):
+        return len(self.result())
+
+    def __contains__(self, item):
+        return item in self.result()
+
+    def __getitem__(self, key):
+        return self.result()[key]
+
+
+def register(fetch, name=None):
+    """
+    Registers a function that fetches an inventory
+    :param fetch:   callable    A function taking no arguments that returns the
+                                inventory, e.g. a list of parameters for
+                                pytest.mark.parametrize
+    :param name:    str         A name for the inventory. Defaults to the name
+                                of fetch
+    :returns:       Inventory   The (not yet fetched) inventory
+    """
+    inventory = Inventory(fetch, name)
+    with _REGISTRY_LOCK:
+        _REGISTRY.append(inventory)
+    return inventory
+
+
+def prefetch_all():
+    """
+    Concurrently fetches every registered inventory that hasn't been fetched yet
+    """
+    with _REGISTRY_LOCK:
+        pending = [inventory for inventory in _REGISTRY if not inventory.fetched]
+    parallel_map(lambda inventory: inventory.prefetch(), pending, max_workers=len(pending))
+
+
+def reset(modules=None):
+    """
+    Resets registered inventories so that they're fetched again
+    :param modules: list[str]   The names of the test modules whose inventories
+                                to reset, or None to reset them all
+    """
+    with _REGISTRY_LOCK:
+        inventories = list(_REGISTRY)
+    for inventory in inventories:
+        if modules is None or inventory.module in modules:
+            inventory.reset()
@@ -0,0 +1,275 @@
+"""
+Matching of github hooks against the allowed hooks in GITHUB_ALLOWED_HOOKS.
+
+dictionary_match defines what it means for a hook to match an allowed hook,
+HookAllowlist compiles a whole list of allowed hooks in to an index so that
+checking a hook doesn't require testing it against every allowed hook.
+"""
+from collections import deque
+
+
+def dictionary_match(dict1, dict2):
+    """
+    Recursively tests whether dict1 is a "loose" subset of dict2, where loose means
+    string values in dict1 are "in" the opposite value in dict2, meaning these two dictionaries
+    are considered "matched":
+
+    dict1:
+
+        {'config' : {'url': 'https://tbonetv.jira.com/rest/bitbucket/1.0/repository'}}
+
+    dict2:
+
+    { 'active': True,
+      'config': {
+          'url':
+          'https://tbonetv.jira.com/rest/bitbucket/1.0/repository/1234/sync'
+        },
+      'created_at': u'2015-08-10T15:10:24Z',
+      'events': ['push'],
+      'id': 123456,
+      'last_response': {
+        'code': 200,
+        'message': u'OK',
+        'status':
+        'active'
+      },
+      'name': u'web',
+      'ping_url': 'https://api.github.com/repos/zeebox/MyRepo/hooks/123456/pings',
+      'test_url': 'https://api.github.com/repos/zeebox/MyRepo/hooks/123456/test',
+      'updated_at': '2015-08-10T15:10:24Z',
+      'url': 'https://api.github.com/repos/zeebox/MyRepo/hooks/123456'}
+
+
+    Shamelessly copied from:
+    http://stackoverflow.com/questions/9323749/python-check-if-one-dictionary-is-a-subset-of-another-larger-dictionary
+    """
+    try:
+        for pkey, pvalue in dict1.items():
+            if type(pvalue) is dict:
+                assert dictionary_match(pvalue, dict2[pkey])
+            elif type(pvalue) is str:
+                assert pvalue in dict2[pkey]
+            else:
+                assert dict2[pkey] == pvalue
+    except (AssertionError, KeyError, TypeError):
+        return False
+    return True
+
+
+class AhoCorasick(object):
+    """
+    Finds which of a set of patterns occur as substrings of a string in a
+    single pass over the string, regardless of the number of patterns.
+    See https://en.wikipedia.org/wiki/Aho%E2%80%93Corasick_algorithm
+    """
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._output[state].append(index)
+
+        # Breadth first, so the failure state of every node is complete before its children
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def search(self, text):
+        """
+        Returns the indexes of all the patterns that occur in text
+        :param text:    str     The string to search
+        :returns:       set     The indexes (in the list of patterns the matcher
+                                was built with) of every pattern found in text
+        """
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set(output[0])
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+# The value of the leaf for an empty dictionary in an allowed hook, which
+# dictionary_match treats as only requiring the key to be present
+_PRESENT = object()
+
+
+def _flatten(rule, path=()):
+    """
+    Returns a list of (path, value) tuples for every leaf of an allowed hook,
+    where path is the tuple of keys leading to value
+    """
+    constraints = []
+    for key, value in rule.items():
+        if type(value) is dict and not value:
+            constraints.append((path + (key,), _PRESENT))
+        elif type(value) is dict:
+            constraints += _flatten(value, path + (key,))
+        else:
+            constraints.append((path + (key,), value))
+    return constraints
+
+
+def _lookup(hook, path):
+    """
+    Returns the value at path in a hook, raising KeyError if it isn't present
+    """
+    for key in path:
+        if not isinstance(hook, dict):
+            raise KeyError(key)
+        hook = hook[key]
+    return hook
+
+
+def _satisfies(hook, path, value):
+    """
+    Tests a single leaf of an allowed hook against a hook, using the same
+    semantics as dictionary_match
+    """
+    try:
+        target = _lookup(hook, path)
+        if value is _PRESENT:
+            return True
+        if type(value) is str:
+            return value in target
+        return target == value
+    except (KeyError, TypeError):
+        return False
+
+
+def _is_indexable(value):
+    """
+    Returns True if a leaf can be found with an index, rather than by testing
+    the allowed hook it's in against every hook
+    """
+    return value is not _PRESENT and _is_hashable(value)
+
+
+def _is_hashable(value):
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+class HookAllowlist(object):
+    """
+    A compiled list of allowed hooks (See GITHUB_ALLOWED_HOOKS). Testing a
+    hook gives the same result as testing dictionary_match against every
+    allowed hook, but each allowed hook is indexed by its most selective leaf
+    so that only a handful of candidates are ever fully compared:
+
+    - String leaves (which match as substrings, e.g. 'config': {'address': ...})
+      are found with one Aho-Corasick matcher per key path
+    - Any other leaves (which must be equal, e.g. 'active': True) are found
+      with a dictionary lookup per key path
+
+    Usage:
+
+        allowlist = HookAllowlist(CONFIG.GITHUB_ALLOWED_HOOKS)
+        allowlist.matches(hook)
+    """
+
+    def __init__(self, rules):
+        self._rules = [_flatten(rule) for rule in rules]
+        self._match_all = any(not constraints for constraints in self._rules)
+        self._unindexed = []
+
+        # How many allowed hooks share each leaf, to pick the most selective one to index
+        frequency = {}
+        for constraints in self._rules:
+            for path, value in constraints:
+                if _is_indexable(value):
+                    frequency[(path, value)] = frequency.get((path, value), 0) + 1
+
+        substrings = {}
+        self._exact = {}
+        for index, constraints in enumerate(self._rules):
+            indexable = [(path, value) for path, value in constraints if _is_indexable(value)]
+            if not indexable:
+                if constraints:
+                    self._unindexed.append(index)
+                continue
+            path, value = min(indexable, key=lambda constraint: frequency[constraint])
+            if type(value) is str:
+                substrings.setdefault(path, {}).setdefault(value, []).append(index)
+            else:
+                self._exact.setdefault(path, {}).setdefault(value, []).append(index)
+
+        # Per key path: (matcher, rule indexes for each pattern, pattern lookup)
+        self._substrings = {}
+        for path, rules_by_pattern in substrings.items():
+            patterns = list(rules_by_pattern)
+            self._substrings[path] = (AhoCorasick(patterns),
+                                      [rules_by_pattern[pattern] for pattern in patterns],
+                                      rules_by_pattern)
+
+    def __len__(self):
+        return len(self._rules)
+
+    def _candidates(self, hook):
+        """
+        Returns the indexes of all allowed hooks whose indexed leaf matches hook
+        """
+        candidates = set(self._unindexed)
+
+        for path, (matcher, rules, rules_by_pattern) in self._substrings.items():
+            try:
+                target = _lookup(hook, path)
+            except KeyError:
+                continue
+            if isinstance(target, type(u'')) or type(target) is str:
+                for pattern_index in matcher.search(target):
+                    candidates.update(rules[pattern_index])
+            elif isinstance(target, (list, tuple, dict)):
+                # `pattern in target` is a membership test rather than a substring test
+                for element in target:
+                    if _is_hashable(element) and element in rules_by_pattern:
+                        candidates.update(rules_by_pattern[element])
+
+        for path, rules_by_value in self._exact.items():
+            try:
+                target = _lookup(hook, path)
+            except KeyError:
+                continue
+            if _is_hashable(target) and target in rules_by_value:
+                candidates.update(rules_by_value[target])
+
+        return candidates
+
+    def matches(self, hook):
+        """
+        Tests whether a hook matches any of the allowed hooks
+        :param hook:    dict    A hook as returned by the github hooks API
+                                (https://developer.github.com/v3/repos/hooks/#list-hooks)
+        :returns:       bool    True if the hook is allowed, False if not
+        """
+        if self._match_all:
+            return True
+        for index in self._candidates(hook):
+            if all(_satisfies(hook, path, value) for path, value in self._rules[index]):
+                return True
+        return False
@@ -0,0 +1,102 @@
+"""
+Index of IPv4 and IPv6 networks for checking whether a network (e.g. the
+CIDR of a security group grant) is covered by a set of approved networks.
+
+Networks are converted to ranges of integer addresses, and the ranges of each
+address family are sorted and merged, so that checking whether a network is
+covered is a binary search, however many networks are in the index:
+
+    index = NetworkIndex(['10.0.0.0/8', '192.168.0.0/16', '2001:db8::/32'])
+    '10.1.2.0/24' in index      # True
+    '11.0.0.0/24' in index      # False
+
+A network is covered if every address in it is covered, so a /16 isn't
+covered by one of the /24s in it, but is covered by a /8 containing it (or by
+two adjacent /17s).
+"""
+import socket
+import bisect
+import binascii
+
+_FAMILIES = ((socket.AF_INET, 32), (socket.AF_INET6, 128))
+
+
+def parse_network(network):
+    """
+    Parses an address or network in CIDR notation (e.g. '10.0.0.0/8')
+    :param network: str     The network
+    :returns:       tuple   (address family, first address, last address), with
+                            addresses as integers, or None if network isn't an
+                            IPv4 or IPv6 address or network
+    """
+    address, _, prefix = str(network).strip().partition('/')
+    for family, bits in _FAMILIES:
+        try:
+            packed = socket.inet_pton(family, address)
+        except (socket.error, ValueError):
+            continue
+        if not prefix:
+            prefix_length = bits
+        elif prefix.isdigit() and int(prefix) <= bits:
+            prefix_length = int(prefix)
+        else:
+            return None
+        host_mask = (1 << (bits - prefix_length)) - 1
+        first = int(binascii.hexlify(packed), 16) & ~host_mask
+        return family, first, first | host_mask
+    return None
+
+
+class NetworkIndex(object):
+    """
+    Sorted, merged address ranges for each address family. Entries that aren't
+    IPv4 or IPv6 networks are ignored.
+    """
+
+    def __init__(self, networks):
+        """
+        :param networks:    iterable    Networks in CIDR notation (or addresses).
+                                        For a dictionary these are its keys
+        """
+        ranges = {}
+        for network in networks:
+            parsed = parse_network(network)
+            if parsed is not None:
+                family, first, last = parsed
+                ranges.setdefault(family, []).append((first, last))
+
+        self._starts = {}
+        self._ends = {}
+        for family, family_ranges in ranges.items():
+            merged = []
+            for first, last in sorted(family_ranges):
+                if merged and first <= merged[-1][1] + 1:
+                    merged[-1][1] = max(merged[-1][1], last)
+                else:
+                    merged.append([first, last])
+            self._starts[family] = [first for first, _ in merged]
+            self._ends[family] = [last for _, last in merged]
+
+    def _covers(self, parsed):
+        family, first, last = parsed
+        starts = self._starts.get(family)
+        if not starts:
+            return False
+        position = bisect.bisect_right(starts, first) - 1
+        return position >= 0 and last <= self._ends[family][position]
+
+    def __contains__(self, network):
+        parsed = parse_network(network)
+        return parsed is not None and self._covers(parsed)
+
+    def covers(self, networks):
+        """
+        Checks a batch of networks
+        :param networks:    iterable    Networks in CIDR notation
+        :returns:           list[bool]  Whether each network is covered. Entries
+                                        that aren't networks aren't covered
+        """
+        return [network in self for network in networks]
+
+    def __len__(self):
+        return sum(len(starts) for starts in self._starts.values())
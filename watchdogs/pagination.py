@@ -0,0 +1,246 @@
+"""
+Pagination of third party APIs.
+
+Each function is a generator yielding every item of a paginated API, fetching
+pages as they're consumed. Where the number of pages is known after the first
+request the remaining pages are fetched concurrently.
+
+- link_header  Next/last page URLs in a Link header (e.g. github)
+- cursor       An opaque cursor or next page URL in each response (e.g.
+               Dropbox, Slack, Facebook)
+- offset       Offset and limit query parameters, optionally with the total
+               number of items in each response (e.g. PagerDuty, Atlassian)
+- page_number  A page number query parameter
+
+Every request is made with watchdogs.client, and an HTTP error response
+raises requests.HTTPError rather than being treated as a page of results.
+
+APIs that don't say how many pages there are are paged until a short page. If
+such an API ignores the offset or page number and returns the same page again,
+paging stops at the repeated page. Likewise paging by Link header or cursor
+stops if a next page URL or cursor repeats. Paging stops with a
+PaginationError after MAX_PAGES pages so that a misbehaving API can't make a
+run hang.
+"""
+try:
+    from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+except ImportError:
+    from urlparse import urlsplit, urlunsplit, parse_qsl
+    from urllib import urlencode
+
+from watchdogs import client
+from watchdogs.concurrency import parallel_map, DEFAULT_MAX_WORKERS
+
+# The most pages fetched from an API that doesn't say how many pages it has
+MAX_PAGES = 10000
+
+
+class PaginationError(Exception):
+    """
+    Raised when an API returns more than MAX_PAGES pages
+    """
+    pass
+
+
+def _check_page_count(pages):
+    """
+    Raises a PaginationError if fetching another page would exceed MAX_PAGES
+    :param pages:   int     The number of pages fetched so far
+    """
+    if pages >= MAX_PAGES:
+        raise PaginationError('Stopped paging after {0} pages'.format(pages))
+
+
+def json_body(response):
+    """
+    The default way of retrieving the items in a page: the JSON body itself
+    """
+    return response.json()
+
+
+def _get(url, **kwargs):
+    response = client.get(url, **kwargs)
+    response.raise_for_status()
+    return response
+
+
+def _set_query(url, **params):
+    """
+    Returns url with the given query parameters set, replacing any existing values
+    """
+    scheme, netloc, path, query, fragment = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(query, keep_blank_values=True) if key not in params]
+    query += sorted(params.items())
+    return urlunsplit((scheme, netloc, path, urlencode(query), fragment))
+
+
+def _query_param(url, name):
+    """
+    Returns the value of a query parameter in url, or None if it isn't present
+    """
+    return dict(parse_qsl(urlsplit(url).query)).get(name)
+
+
+def _fetch_concurrently(requests, fetch, items, max_workers):
+    """
+    Fetches pages in batches of max_workers, yielding their items in order
+    """
+    for start in range(0, len(requests), max_workers):
+        for response in parallel_map(fetch, requests[start:start + max_workers], max_workers):
+            for item in items(response):
+                yield item
+
+
+def link_header(url, items=json_body, params=None, max_workers=DEFAULT_MAX_WORKERS, **kwargs):
+    """
+    Pages through an API that links to the next page in a Link header. If the
+    first page also links to the last page by page number (as github does)
+    all the remaining pages are fetched concurrently.
+    See https://developer.github.com/v3/#pagination
+    :param url:         str         The URL of the first page
+    :param items:       callable    Returns the items in a response
+    :param params:      dict        Query parameters for the first page (Links
+                                    to later pages already include them)
+    :param max_workers: int         The maximum number of pages to fetch at once
+    :param kwargs:                  Any other arguments for client.get, e.g. auth
+    """
+    response = _get(url, params=params, **kwargs)
+    for item in items(response):
+        yield item
+
+    last_url = response.links.get('last', {}).get('url')
+    last_page = _query_param(last_url, 'page') if last_url else None
+    if last_page is not None and last_page.isdigit():
+        _check_page_count(int(last_page))
+        urls = [_set_query(last_url, page=page) for page in range(2, int(last_page) + 1)]
+        for item in _fetch_concurrently(urls, lambda page_url: _get(page_url, **kwargs), items, max_workers):
+            yield item
+        return
+
+    seen_urls = set()
+    next_url = response.links.get('next', {}).get('url')
+    while next_url and next_url not in seen_urls:
+        _check_page_count(len(seen_urls) + 1)
+        seen_urls.add(next_url)
+        response = _get(next_url, **kwargs)
+        for item in items(response):
+            yield item
+        next_url = response.links.get('next', {}).get('url')
+
+
+def cursor(first_page, next_page, items, next_cursor):
+    """
+    Pages through an API that returns a cursor (or the URL of the next page)
+    in each response
+    :param first_page:  callable    Takes no arguments and returns the response
+                                    for the first page
+    :param next_page:   callable    Takes a cursor and returns the response for
+                                    the page it points to
+    :param items:       callable    Returns the items in a response
+    :param next_cursor: callable    Returns the cursor for the page after a
+                                    response, or a false value on the last page
+    """
+    seen_cursors = set()
+    response = first_page()
+    while True:
+        response.raise_for_status()
+        for item in items(response):
+            yield item
+        page_cursor = next_cursor(response)
+        if not page_cursor or page_cursor in seen_cursors:
+            return
+        _check_page_count(len(seen_cursors) + 1)
+        seen_cursors.add(page_cursor)
+        response = next_page(page_cursor)
+
+
+def offset(url, items=json_body, total=None, limit=100, offset_param='offset', limit_param='limit',
+           start=0, params=None, max_workers=DEFAULT_MAX_WORKERS, **kwargs):
+    """
+    Pages through an API using offset and limit query parameters. If the total
+    number of items is known after the first page all the remaining pages are
+    fetched concurrently, otherwise pages are fetched until a short page.
+    :param url:             str         The URL of the API
+    :param items:           callable    Returns the items in a response
+    :param total:           callable    Returns the total number of items from a
+                                        response, if the API provides it
+    :param limit:           int         The number of items to request per page
+    :param offset_param:    str         The name of the offset query parameter
+    :param limit_param:     str         The name of the limit query parameter
+    :param start:           int         The offset of the first item
+    :param params:          dict        Any other query parameters
+    :param max_workers:     int         The maximum number of pages to fetch at once
+    :param kwargs:                      Any other arguments for client.get
+    """
+    def fetch(page_offset):
+        page_params = dict(params or {})
+        page_params.update({offset_param: page_offset, limit_param: limit})
+        return _get(url, params=page_params, **kwargs)
+
+    response = fetch(start)
+    page = list(items(response))
+    for item in page:
+        yield item
+
+    count = total(response) if total is not None else None
+    if count is not None:
+        # The API may return fewer items per page than asked for
+        if page:
+            offsets = list(range(start + len(page), start + count, len(page)))
+            for item in _fetch_concurrently(offsets, fetch, items, max_workers):
+                yield item
+        return
+
+    for item in _until_short_page(page, fetch, items, start, lambda position, page: position + len(page)):
+        yield item
+
+
+def page_number(url, items=json_body, page_param='page', first_page=1, params=None, **kwargs):
+    """
+    Pages through an API using a page number query parameter, until a page is
+    shorter than the pages before it (or empty)
+    :param url:         str         The URL of the API
+    :param items:       callable    Returns the items in a response
+    :param page_param:  str         The name of the page number query parameter
+    :param first_page:  int         The number of the first page
+    :param params:      dict        Any other query parameters
+    :param kwargs:                  Any other arguments for client.get
+    """
+    def fetch(page_number):
+        page_params = dict(params or {})
+        page_params[page_param] = page_number
+        return _get(url, params=page_params, **kwargs)
+
+    page = list(items(fetch(first_page)))
+    for item in page:
+        yield item
+
+    for item in _until_short_page(page, fetch, items, first_page, lambda position, page: position + 1):
+        yield item
+
+
+def _until_short_page(page, fetch, items, position, advance):
+    """
+    Keeps fetching pages until one is shorter than the longest page so far
+    (rather than shorter than the number of items requested, so that APIs
+    returning fewer items than requested aren't cut short), or is the same as
+    the page before it (as it is when an API ignores the position)
+    :param page:        list        The items in the first page
+    :param fetch:       callable    Returns the response for a position
+    :param items:       callable    Returns the items in a response
+    :param position:    int         The position of the first page
+    :param advance:     callable    Returns the position of the page after the
+                                    given position and page of items
+    """
+    page_size = len(page)
+    pages = 1
+    while page and len(page) >= page_size:
+        _check_page_count(pages)
+        position = advance(position, page)
+        previous_page, page = page, list(items(fetch(position)))
+        if page == previous_page:
+            return
+        pages += 1
+        page_size = max(page_size, len(page))
+        for item in page:
+            yield item
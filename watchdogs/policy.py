@@ -0,0 +1,200 @@
+"""
+Exception policies: the dictionaries in config.py (e.g. SLACK_EXCEPTIONS,
+ATLASSIAN_EXCEPTIONS) that allow users who aren't otherwise known, usually
+until a date:
+
+    {'partner@external.com': {'description': 'DESCRIPTION', 'allowed_until': 'dd/mm/yyyy'}}
+
+An ExceptionPolicy compiles the exceptions once: regular expression keys are
+combined in to a single pattern (or a few, as Python 2 limits the number of
+groups in a pattern) and each allowed_until date is parsed up front, so
+matching a user is a single regular expression match (or a dictionary lookup
+for literal keys) however many exceptions there are.
+
+When more than one exception matches, the first declared wins. Declaration
+order is the iteration order of the dictionary, so use an OrderedDict (or a
+list of (key, exception) pairs) where the order matters on Python 2.
+
+Regular expression keys are matched against the start of the value (as with
+re.match). Keys that can't be combined with others without changing their
+meaning (those with inline flags such as (?i), named groups, backreferences or
+conditionals) are compiled on their own and tried in their declared position.
+
+Tests normally get policies from the loaded config, which builds each one once:
+
+    exception = CONFIG.exception_policy('SLACK_EXCEPTIONS').match(email)
+"""
+import re
+import time
+import calendar
+import threading
+from collections import namedtuple
+
+DATE_FORMAT = '%d/%m/%Y'
+
+# Python 2's re module supports at most 100 groups per pattern
+MAX_GROUPS = 99
+
+# Constructs that apply to (or refer to) the whole pattern they're in: inline
+# flags, named groups and references to them, conditionals and numbered
+# backreferences
+_STANDALONE = re.compile(r'\(\?[aiLmsux]|\(\?P[<=]|\(\?\(|\\[1-9]')
+
+
+class PolicyException(namedtuple('PolicyException', ['key', 'description', 'allowed_until', 'options'])):
+    """
+    A single exception. allowed_until is the time (In seconds since the epoch)
+    the exception stops applying from, or None if it doesn't expire. options is
+    the exception's dictionary from config.py.
+    """
+    __slots__ = ()
+
+    def expired(self, now=None):
+        """
+        Returns True if the exception no longer applies
+        :param now: float   The current time in seconds since the epoch
+        """
+        if self.allowed_until is None:
+            return False
+        return (time.time() if now is None else now) > self.allowed_until
+
+
+def parse_date(date_string, date_format=DATE_FORMAT):
+    """
+    Returns a date (in UTC) as seconds since the epoch
+    """
+    return calendar.timegm(time.strptime(date_string, date_format))
+
+
+class ExceptionPolicy(object):
+    """
+    A compiled set of exceptions
+    """
+
+    def __init__(self, exceptions, literal=False, date_format=DATE_FORMAT):
+        """
+        :param exceptions:  dict        Keys mapped to exception dictionaries
+                                        (or a list of (key, exception) pairs)
+        :param literal:     bool        If True keys are matched exactly,
+                                        otherwise they are regular expressions
+        :param date_format: str         The format of allowed_until dates
+        """
+        items = exceptions.items() if hasattr(exceptions, 'items') else exceptions
+        self.exceptions = []
+        for key, options in items:
+            allowed_until = options.get('allowed_until')
+            if allowed_until is not None:
+                allowed_until = parse_date(allowed_until, date_format)
+            self.exceptions.append(PolicyException(key, options.get('description'), allowed_until, options))
+
+        self.literal = literal
+        self._literals = {}
+        self._patterns = []
+        if literal:
+            for exception in reversed(self.exceptions):
+                self._literals[exception.key] = exception
+        else:
+            self._patterns = _combine(self.exceptions)
+
+        self._matches = {}
+        self._matches_lock = threading.Lock()
+
+    def _match(self, value):
+        if self.literal:
+            return self._literals.get(value)
+        for pattern, groups, exception in self._patterns:
+            match = pattern.match(value)
+            if match is not None:
+                return exception if groups is None else groups[match.lastindex]
+        return None
+
+    def match(self, value):
+        """
+        Returns the first exception matching value, or None
+        :param value:   str                 e.g. an email address
+        :returns:       PolicyException     The matching exception
+        """
+        with self._matches_lock:
+            if value in self._matches:
+                return self._matches[value]
+        exception = self._match(value)
+        with self._matches_lock:
+            self._matches[value] = exception
+        return exception
+
+    def evaluate(self, values):
+        """
+        Matches a batch of values in one pass. The results are kept, so later
+        calls to match for the same values don't match them again.
+        :param values:  iterable    The values to match
+        :returns:       dict        Each value mapped to its PolicyException, or None
+        """
+        results = dict((value, self._match(value)) for value in set(values))
+        with self._matches_lock:
+            self._matches.update(results)
+        return results
+
+    def expiring_within(self, days, now=None):
+        """
+        Returns the exceptions that expire in the next number of days, soonest first
+        :param days:    int                     The number of days
+        :param now:     float                   The current time in seconds since the epoch
+        :returns:       list[PolicyException]   The exceptions
+        """
+        now = time.time() if now is None else now
+        until = now + days * 24 * 60 * 60
+        expiring = [exception for exception in self.exceptions
+                    if exception.allowed_until is not None and now <= exception.allowed_until <= until]
+        return sorted(expiring, key=lambda exception: exception.allowed_until)
+
+    def __len__(self):
+        return len(self.exceptions)
+
+
+def _is_standalone(key):
+    """
+    Returns True if a regular expression key has to be compiled on its own
+    rather than combined with other keys (See _STANDALONE)
+    """
+    return _STANDALONE.search(key) is not None
+
+
+def _combine(exceptions):
+    """
+    Combines the keys of exceptions in to as few patterns as possible. Each key
+    is wrapped in a group, and the index of the (outermost) group that matched
+    identifies the exception. Alternatives are tried in order, so the first
+    declared exception that matches wins. Standalone keys are compiled on their
+    own, splitting the combined patterns so that the order is kept.
+    :returns:   list[tuple]     (pattern, {group index: PolicyException}, None)
+                                for combined keys and (pattern, None,
+                                PolicyException) for standalone keys
+    """
+    patterns = []
+    chunk = []
+    groups = 0
+    for exception in exceptions:
+        if _is_standalone(exception.key):
+            if chunk:
+                patterns.append(_compile_chunk(chunk))
+                chunk, groups = [], 0
+            patterns.append((re.compile(exception.key), None, exception))
+            continue
+
+        exception_groups = 1 + re.compile(exception.key).groups
+        if chunk and groups + exception_groups > MAX_GROUPS:
+            patterns.append(_compile_chunk(chunk))
+            chunk, groups = [], 0
+        chunk.append(exception)
+        groups += exception_groups
+    if chunk:
+        patterns.append(_compile_chunk(chunk))
+    return patterns
+
+
+def _compile_chunk(exceptions):
+    pattern = re.compile('|'.join('(?P<_exception{0}>{1})'.format(index, exception.key)
+                                  for index, exception in enumerate(exceptions)))
+    groups = dict((pattern.groupindex['_exception{0}'.format(index)], exception)
+                  for index, exception in enumerate(exceptions))
+    return pattern, groups, None